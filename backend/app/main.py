@@ -1,18 +1,47 @@
-from fastapi import FastAPI, HTTPException, Depends
+import time
+# Taken before any other import, to report how long importing the app takes
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from pymongo.database import Database
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, AsyncIterator
+import asyncio
+import json
+import math
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from .utils.summarize import get_news_insights
+from .utils.summarize import close_openai_client
+from .utils.fetch_google_results import close_http_client
 from .routers import auth, search_terms
-from .mongodb.models import UserModel, SearchTermModel, CacheModel
-from .mongodb.config import db, get_db
+from .mongodb.config import get_db, get_client, get_database, close_client
+from .mongodb import bootstrap
 from .utils.security import get_current_user_optional
-from .services import search_term_service, cache_service
+from .utils import metrics
+from .utils.admission import AdmissionRejected
+from .utils.resilience import CircuitOpen, UpstreamError
+from .utils.compression import CompressionMiddleware
+from .utils.insights_json import serialize_insights
+from .services import search_term_service, cache_service, insights_service, prewarm_service, write_behind_service
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+metrics.STARTUP_SECONDS.set(IMPORT_SECONDS, phase="import")
 
 app = FastAPI(title="News AI API")
 
+# Create indexes in the background on startup; disable when they are created
+# ahead of deploys with `python -m app.mongodb.bootstrap`
+MONGODB_CREATE_INDEXES_ON_STARTUP = os.getenv("MONGODB_CREATE_INDEXES_ON_STARTUP", "true").lower() == "true"
+# How long /api/ready waits for a database ping
+READY_PING_TIMEOUT_SECONDS = float(os.getenv("READY_PING_TIMEOUT_SECONDS", "2"))
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -20,7 +49,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Age", "X-Cache", "X-Next-Cursor", "Retry-After", "ETag", "Last-Modified"],
 )
+# Larger JSON bodies are gzip/brotli compressed; streamed responses are not
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
 
 # Include routers
 app.include_router(auth.router)
@@ -35,58 +67,406 @@ class Insight(BaseModel):
     source_title: str
     source_link: str
 
+# Sent instead of the text of unexpected errors, which can include upstream
+# URLs and credentials; the error itself is logged
+INTERNAL_ERROR_DETAIL = "Internal server error"
+
+# Upper bound on the terms accepted by one batch request
+MAX_BATCH_TERMS = 50
+
+class BatchSearchRequest(BaseModel):
+    search_terms: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_TERMS)
+    num_results: int = 5
+
+class BatchInsightsResult(BaseModel):
+    search_term: str
+    insights: List[Insight]
+    cache: str
+    age_seconds: int
+    error: Optional[str] = None
+
+class BatchInsightsResponse(BaseModel):
+    results: List[BatchInsightsResult]
+
 @app.post("/api/insights", response_model=List[Insight])
 async def get_insights(
     request: SearchRequest,
-    db: Database = Depends(get_db),
+    http_request: Request,
+    response: Response,
+    db: AsyncIOMotorDatabase = Depends(get_db),
     current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional)
+):
+    """
+    Get insights for a search term.
+
+    Responses carry an ETag and Last-Modified; a client polling a term can
+    send them back as If-None-Match / If-Modified-Since and gets an empty 304
+    while the insights are unchanged.
+    """
+    prewarm_service.record_request(request.search_term, request.num_results)
+
+    with metrics.IN_FLIGHT.track_in_progress(operation="insights_request"):
+        return await _get_insights(request, http_request, response, db, current_user)
+
+async def _get_insights(
+    request: SearchRequest,
+    http_request: Request,
+    response: Response,
+    db: AsyncIOMotorDatabase,
+    current_user: Optional[Dict[str, Any]]
 ):
     try:
-        cached_insights = cache_service.get_cached_insights(
+        cached = await cache_service.lookup_insights(
             db, request.search_term, request.num_results
         )
 
-        if cached_insights:
-            print(f"Cache hit for search term: {request.search_term}")
-            return cached_insights
+        if cached:
+            # Age lets clients tell how old a cached answer is
+            response.headers["Age"] = str(cached["age_seconds"])
+            if cached["stale"]:
+                # Serve the stale answer now and refresh it in the background
+                print(f"Stale cache hit for search term: {request.search_term}")
+                insights_service.schedule_refresh(
+                    db, request.search_term, request.num_results
+                )
+                response.headers["X-Cache"] = "STALE"
+            else:
+                print(f"Cache hit for search term: {request.search_term}")
+                response.headers["X-Cache"] = "HIT"
+            return _conditional_response(
+                http_request, response, cached["body"], cached["etag"], cached["created_at"]
+            )
 
         print(f"Cache miss for search term: {request.search_term}")
-        insights = get_news_insights(request.search_term, request.num_results)
+        insights = await insights_service.refresh_insights(
+            db, request.search_term, request.num_results
+        )
 
         if not insights:
             raise HTTPException(status_code=404, detail="No insights found")
 
-        cache_service.save_insights_to_cache(
-            db, request.search_term, insights, request.num_results
-        )
-
         if current_user:
             try:
-                search_term_service.create_search_term(
+                await search_term_service.record_search_term(
                     db, request.search_term, str(current_user["_id"])
                 )
             except Exception as e:
                 print(f"Failed to save search term: {e}")
 
-        return insights
+        response.headers["Age"] = "0"
+        response.headers["X-Cache"] = "MISS"
+        # A refresh that produced the same insights still answers 304
+        return _conditional_response(
+            http_request, response, serialize_insights(insights),
+            cache_service.insights_etag(insights), datetime.utcnow()
+        )
+    except HTTPException:
+        raise
+    except (AdmissionRejected, CircuitOpen, UpstreamError) as e:
+        # An upstream is saturated, down or failing: an outdated answer beats an error
+        fallback = await cache_service.lookup_last_known(
+            db, request.search_term, request.num_results
+        )
+        if fallback:
+            print(f"Serving last known insights for '{request.search_term}': {e}")
+            response.headers["Age"] = str(fallback["age_seconds"])
+            response.headers["X-Cache"] = "STALE"
+            return _conditional_response(
+                http_request, response, fallback["body"], fallback["etag"], fallback["created_at"]
+            )
+        raise _upstream_unavailable(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Error getting insights for '{request.search_term}': {e!r}")
+        raise HTTPException(status_code=500, detail=INTERNAL_ERROR_DETAIL)
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag value."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == f'"{etag}"':
+            return True
+    return False
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole-second precision
+    return last_modified.replace(microsecond=0) <= since
+
+def _conditional_response(
+    http_request: Request,
+    response: Response,
+    body: bytes,
+    etag: str,
+    created_at: datetime
+) -> Response:
+    """
+    Send already serialized insights, or 304 if the client is up to date.
+
+    The body is sent as is, skipping response_model validation and JSON
+    encoding (serialize_insights has already done both). Headers set on
+    `response` are carried over. If-None-Match takes precedence over
+    If-Modified-Since, as in RFC 9110.
+    """
+    last_modified = created_at.replace(tzinfo=timezone.utc)
+    response.headers["ETag"] = f'W/"{etag}"'
+    response.headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = http_request.headers.get("if-none-match")
+    if_modified_since = http_request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    elif if_modified_since is not None:
+        not_modified = _not_modified_since(if_modified_since, last_modified)
+    else:
+        not_modified = False
+
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _upstream_unavailable(e: Exception) -> HTTPException:
+    """
+    429 when an upstream is at capacity, 503 while its circuit is open, 502
+    when a call to it failed.
+    """
+    if isinstance(e, UpstreamError):
+        return HTTPException(status_code=502, detail=str(e))
+    return HTTPException(
+        status_code=503 if isinstance(e, CircuitOpen) else 429,
+        detail=str(e),
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+def _error_payload(e: Exception) -> Dict[str, Any]:
+    """Body of a streamed "error" event; only our own upstream errors are described."""
+    if isinstance(e, (AdmissionRejected, CircuitOpen, UpstreamError)):
+        error = _upstream_unavailable(e)
+        payload = {"detail": error.detail, "status": error.status_code}
+        if not isinstance(e, UpstreamError):
+            payload["retry_after"] = math.ceil(e.retry_after)
+        return payload
+    return {"detail": INTERNAL_ERROR_DETAIL, "status": 500}
+
+def _stream_line(payload: Dict[str, Any], event: str, sse: bool) -> str:
+    """Frame one streamed message as an SSE event or an NDJSON line."""
+    data = json.dumps(payload)
+    if sse:
+        return f"event: {event}\ndata: {data}\n\n"
+    return data + "\n"
+
+@app.post("/api/insights/stream")
+async def stream_insights(
+    request: SearchRequest,
+    http_request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user_optional)
+):
+    """
+    Stream insights as they are generated.
+
+    Responds with Server-Sent Events when the client accepts
+    text/event-stream, and with newline-delimited JSON otherwise. Each message
+    is one insight; SSE clients also get a final "done" (or "error") event.
+    """
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    prewarm_service.record_request(request.search_term, request.num_results)
+
+    cached = await cache_service.lookup_insights(
+        db, request.search_term, request.num_results
+    )
+    headers = {}
+    if cached:
+        headers["Age"] = str(cached["age_seconds"])
+        headers["X-Cache"] = "STALE" if cached["stale"] else "HIT"
+        if cached["stale"]:
+            insights_service.schedule_refresh(
+                db, request.search_term, request.num_results
+            )
+    else:
+        headers["Age"] = "0"
+        headers["X-Cache"] = "MISS"
+
+    async def events() -> AsyncIterator[str]:
+        count = 0
+        try:
+            if cached:
+                for insight in cached["insights"]:
+                    count += 1
+                    yield _stream_line(insight, "insight", sse)
+            else:
+                print(f"Cache miss for search term: {request.search_term}")
+                async for insight in insights_service.stream_insights(
+                    db, request.search_term, request.num_results
+                ):
+                    count += 1
+                    yield _stream_line(insight, "insight", sse)
+
+                if count and current_user:
+                    try:
+                        await search_term_service.record_search_term(
+                            db, request.search_term, str(current_user["_id"])
+                        )
+                    except Exception as e:
+                        print(f"Failed to save search term: {e}")
+        except Exception as e:
+            print(f"Error streaming insights: {e!r}")
+            yield _stream_line(_error_payload(e), "error", sse)
+            return
+
+        if sse:
+            yield _stream_line({"count": count}, "done", sse)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    headers["Cache-Control"] = "no-cache"
+    return StreamingResponse(events(), media_type=media_type, headers=headers)
+
+@app.post("/api/insights/batch", response_model=BatchInsightsResponse, response_model_exclude_none=True)
+async def batch_insights(
+    request: BatchSearchRequest,
+    http_request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Get insights for several search terms in one request.
+
+    Cached terms are answered from one batched lookup and misses run
+    concurrently. Returns {"results": [...]} in request order once every term
+    is done; clients that accept application/x-ndjson or text/event-stream
+    instead get each term's result as soon as it completes.
+    """
+    for term in request.search_terms:
+        prewarm_service.record_request(term, request.num_results)
+
+    accept = http_request.headers.get("accept", "")
+    sse = "text/event-stream" in accept
+    if sse or "application/x-ndjson" in accept:
+        async def events() -> AsyncIterator[str]:
+            count = 0
+            try:
+                async for result in insights_service.batch_insights(
+                    db, request.search_terms, request.num_results
+                ):
+                    count += 1
+                    yield _stream_line(result, "result", sse)
+            except Exception as e:
+                print(f"Error streaming batch insights: {e!r}")
+                yield _stream_line(_error_payload(e), "error", sse)
+                return
+
+            if sse:
+                yield _stream_line({"count": count}, "done", sse)
+
+        media_type = "text/event-stream" if sse else "application/x-ndjson"
+        return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+    try:
+        with metrics.IN_FLIGHT.track_in_progress(operation="insights_batch_request"):
+            by_term = {
+                result["search_term"]: result
+                async for result in insights_service.batch_insights(
+                    db, request.search_terms, request.num_results
+                )
+            }
+        return {"results": [by_term[term] for term in request.search_terms]}
+    except Exception as e:
+        print(f"Error getting batch insights: {e!r}")
+        raise HTTPException(status_code=500, detail=INTERNAL_ERROR_DETAIL)
 
 @app.get("/api/health")
 async def health_check():
+    """Liveness: the process is up. Doesn't touch the database."""
     return {"status": "healthy"}
 
-# Create MongoDB indexes on startup
+@app.get("/api/ready")
+async def readiness_check(response: Response):
+    """
+    Readiness: startup bootstrapping has finished and MongoDB answers a ping.
+
+    Responds 503 until then, so a load balancer only routes traffic to
+    instances that can serve it. Collections whose indexes could not be
+    created are listed under index_errors.
+    """
+    checks = {
+        "bootstrap": _bootstrap_task is not None and _bootstrap_task.done(),
+        "mongodb": await _ping_database(),
+    }
+    ready = all(checks.values())
+    if not ready:
+        response.status_code = 503
+    body = {"status": "ready" if ready else "not ready", "checks": checks}
+    if bootstrap.index_errors:
+        # Serving works without them, but someone needs to look (see the logs)
+        body["index_errors"] = sorted(bootstrap.index_errors)
+    return body
+
+async def _ping_database() -> bool:
+    try:
+        await asyncio.wait_for(get_client().admin.command("ping"), READY_PING_TIMEOUT_SECONDS)
+        return True
+    except Exception as e:
+        print(f"MongoDB ping failed: {e}")
+        return False
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Pipeline latency, cache, upstream and in-flight metrics in Prometheus text format."""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/api/cache/stats")
+async def cache_stats(db: AsyncIOMotorDatabase = Depends(get_db)):
+    return {**cache_service.get_cache_stats(), "storage": await cache_service.get_recent_storage_stats(db)}
+
+_bootstrap_task: Optional[asyncio.Task] = None
+
 @app.on_event("startup")
 async def startup_db_client():
-    SearchTermModel.create_indexes(db)
-    CacheModel.create_indexes(db)
-    UserModel.create_indexes(db)
-    print("MongoDB connection established and indexes created")
+    global _bootstrap_task
+    start = time.perf_counter()
+    db = get_database()
+    write_behind_service.start_writer()
+    prewarm_service.start_prewarm_scheduler(db)
+    # Everything that waits on MongoDB runs in the background, so the app
+    # serves /api/health at once and /api/ready when it is done
+    _bootstrap_task = asyncio.create_task(_bootstrap_database(db))
+    elapsed = time.perf_counter() - start
+    metrics.STARTUP_SECONDS.set(elapsed, phase="startup")
+    print(f"Started in {elapsed:.3f}s (imports took {IMPORT_SECONDS:.3f}s)")
+
+async def _bootstrap_database(db: AsyncIOMotorDatabase) -> None:
+    start = time.perf_counter()
+    if MONGODB_CREATE_INDEXES_ON_STARTUP:
+        errors = await bootstrap.create_indexes_with_retry(db)
+        if errors:
+            print(f"MongoDB indexes missing for: {', '.join(errors)}")
+        else:
+            print("MongoDB indexes created")
+    try:
+        await cache_service.load_semantic_index(db)
+    except Exception as e:
+        # The index also fills as new entries are cached
+        print(f"Failed to load semantic cache index: {e}")
+    elapsed = time.perf_counter() - start
+    metrics.STARTUP_SECONDS.set(elapsed, phase="bootstrap")
+    print(f"MongoDB bootstrap finished in {elapsed:.3f}s")
 
 # Close MongoDB connection on shutdown
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    from .mongodb.config import client
-    client.close()
-    print("MongoDB connection closed")
\ No newline at end of file
+    if _bootstrap_task is not None and not _bootstrap_task.done():
+        _bootstrap_task.cancel()
+    await prewarm_service.stop_prewarm_scheduler()
+    # Flush deferred writes while the client is still open
+    await write_behind_service.stop_writer()
+    close_client()
+    await close_http_client()
+    await close_openai_client()
+    print("MongoDB connection closed")
@@ -0,0 +1,110 @@
+"""
+Create the MongoDB indexes the app relies on.
+
+The app does this in the background on startup (unless
+MONGODB_CREATE_INDEXES_ON_STARTUP=false). To do it once ahead of a deploy
+instead, run from the backend directory:
+
+    python -m app.mongodb.bootstrap
+"""
+import asyncio
+import sys
+import time
+from typing import Dict
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
+
+from .config import close_client, get_database
+from .models import UserModel, SearchTermModel, CacheModel, ArticleInsightModel
+from ..services import cache_service
+
+MODELS = (SearchTermModel, CacheModel, UserModel, ArticleInsightModel)
+
+# Errors that may go away by themselves (the database is unreachable or
+# slow); anything else, e.g. a duplicate key, needs fixing first
+RETRYABLE_ERRORS = (ConnectionFailure, ExecutionTimeout)
+
+# Collections whose indexes could not be created, with the error
+index_errors: Dict[str, str] = {}
+
+
+async def _create_model_indexes(db: AsyncIOMotorDatabase, model) -> None:
+    if model is CacheModel:
+        await CacheModel.create_indexes(
+            db, ttl_seconds=int(cache_service.CACHE_RETENTION.total_seconds())
+        )
+    else:
+        await model.create_indexes(db)
+
+
+async def create_indexes(db: AsyncIOMotorDatabase) -> Dict[str, str]:
+    """
+    Create (or update) the indexes of every collection.
+
+    Each collection is handled separately, so one failing doesn't stop the
+    others.
+
+    Returns:
+        Dict[str, str]: Error by collection name, for those that failed
+    """
+    errors = {}
+    for model in MODELS:
+        try:
+            await _create_model_indexes(db, model)
+        except Exception as e:
+            print(f"Index creation failed for {model.collection_name}: {e}")
+            errors[model.collection_name] = str(e)
+    return errors
+
+
+async def create_indexes_with_retry(db: AsyncIOMotorDatabase, retry_seconds: float = 5.0, max_retry_seconds: float = 60.0) -> Dict[str, str]:
+    """
+    Create every collection's indexes, retrying while the database is unreachable.
+
+    Used on startup, so an unreachable database delays readiness instead of
+    failing the app; the wait between attempts doubles up to max_retry_seconds.
+    Other errors are not retried: they are logged and recorded in
+    index_errors.
+
+    Returns:
+        Dict[str, str]: Error by collection name, for those that failed
+    """
+    for model in MODELS:
+        delay = retry_seconds
+        while True:
+            try:
+                await _create_model_indexes(db, model)
+                index_errors.pop(model.collection_name, None)
+                break
+            except RETRYABLE_ERRORS as e:
+                print(f"Index creation for {model.collection_name} failed, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_retry_seconds)
+            except Exception as e:
+                print(f"Index creation for {model.collection_name} failed and will not be retried: {e}")
+                index_errors[model.collection_name] = str(e)
+                break
+    return dict(index_errors)
+
+
+async def _main() -> bool:
+    start = time.perf_counter()
+    errors = await create_indexes(get_database())
+    if errors:
+        print(f"Index creation failed for: {', '.join(errors)}")
+        return False
+    print(f"Indexes created in {time.perf_counter() - start:.2f}s")
+    return True
+
+
+def main() -> None:
+    try:
+        ok = asyncio.run(_main())
+    finally:
+        close_client()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Rewrite `cache` entries stored in the original format in the compact one, and
+delete entries from before they had a cache_key.
+
+The app reads both formats, so this can run while it is serving. Run from the
+backend directory:
+
+    python -m app.mongodb.migrate_cache
+"""
+import argparse
+import asyncio
+
+from .config import close_client, get_database
+from .models import CacheModel
+from ..services import cache_service
+
+
+def _print_storage(label: str, stats: dict) -> None:
+    if not stats:
+        print(f"{label}: storage stats unavailable")
+        return
+    print(
+        f"{label}: {stats['count']} entries, {stats['size_bytes']} bytes of data "
+        f"({stats['avg_document_bytes']} per entry), {stats['storage_bytes']} bytes on disk"
+    )
+
+
+async def migrate(batch_size: int) -> None:
+    db = get_database()
+    removed = await cache_service.remove_unkeyed_entries(db)
+    print(f"Removed {removed} cache entries without a cache_key")
+    await CacheModel.create_indexes(db, ttl_seconds=int(cache_service.CACHE_RETENTION.total_seconds()))
+    _print_storage("Before", await cache_service.get_storage_stats(db))
+    migrated = await cache_service.migrate_legacy_entries(db, batch_size)
+    print(f"Migrated {migrated} cache entries")
+    _print_storage("After", await cache_service.get_storage_stats(db))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="documents rewritten per bulk_write")
+    args = parser.parse_args()
+    try:
+        asyncio.run(migrate(args.batch_size))
+    finally:
+        close_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,15 @@
 from datetime import datetime
 from typing import Dict, Any
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 # User model
 class UserModel:
     collection_name = "users"
 
     @staticmethod
-    def create_indexes(db):
-        db[UserModel.collection_name].create_index("email", unique=True)
-        db[UserModel.collection_name].create_index("username", unique=True)
+    async def create_indexes(db: AsyncIOMotorDatabase):
+        await db[UserModel.collection_name].create_index("email", unique=True)
+        await db[UserModel.collection_name].create_index("username", unique=True)
 
     @staticmethod
     def to_document(email: str, username: str, hashed_password: str) -> Dict[str, Any]:
@@ -29,12 +29,16 @@ class SearchTermModel:
     collection_name = "search_terms"
 
     @staticmethod
-    def create_indexes(db: Database):
+    async def create_indexes(db: AsyncIOMotorDatabase):
         """Create necessary indexes for the SearchTerm collection."""
-        db[SearchTermModel.collection_name].create_index(
+        await db[SearchTermModel.collection_name].create_index(
             [("user_id", 1), ("term", 1)],
             unique=True
         )
+        # Serves the newest-first, cursor-paginated history listing
+        await db[SearchTermModel.collection_name].create_index(
+            [("user_id", 1), ("created_at", -1), ("_id", -1)]
+        )
 
     @staticmethod
     def to_document(term: str, user_id: str) -> Dict[str, Any]:
@@ -49,22 +53,78 @@ class CacheModel:
     collection_name = "cache"
 
     @staticmethod
-    def create_indexes(db):
-        """Create necessary indexes for the Cache collection."""
-        db[CacheModel.collection_name].create_index(
-            [("search_term", 1), ("num_results", 1)],
-            unique=True
-        )
-        db[CacheModel.collection_name].create_index(
+    async def create_indexes(db: AsyncIOMotorDatabase, ttl_seconds: int = 86400):
+        """
+        Create necessary indexes for the Cache collection.
+
+        Args:
+            db: Database to create the indexes in
+            ttl_seconds: How long after created_at Mongo deletes an entry
+        """
+        collection = db[CacheModel.collection_name]
+        # Entries used to be keyed on the raw search term; they are now keyed
+        # on its canonical form, so the old unique index would reject upserts
+        existing = await collection.index_information()
+        if "search_term_1_num_results_1" in existing:
+            await collection.drop_index("search_term_1_num_results_1")
+        # Documents written before cache_key existed have no key (lookups
+        # never match them; app.mongodb.migrate_cache removes them), so the
+        # index skips them instead of colliding on null. An index built by an
+        # earlier version without the filter is left as it is.
+        if "cache_key_1_num_results_1" not in existing:
+            await collection.create_index(
+                [("cache_key", 1), ("num_results", 1)],
+                unique=True,
+                partialFilterExpression={"cache_key": {"$exists": True}}
+            )
+        ttl_index = existing.get("created_at_1")
+        if ttl_index is not None and ttl_index.get("expireAfterSeconds") != ttl_seconds:
+            # create_index refuses to change the options of an existing index
+            await db.command({
+                "collMod": CacheModel.collection_name,
+                "index": {"keyPattern": {"created_at": 1}, "expireAfterSeconds": ttl_seconds}
+            })
+        else:
+            await collection.create_index(
+                "created_at",
+                expireAfterSeconds=ttl_seconds
+            )
+
+    @staticmethod
+    def to_document(search_term: str, cache_key: str, format: int, payload: bytes, etag: str, num_results: int) -> Dict[str, Any]:
+        # Insights are stored as a compressed payload (see utils/cache_codec.py)
+        return {
+            "search_term": search_term,
+            "cache_key": cache_key,
+            "format": format,
+            "payload": payload,
+            "etag": etag,
+            "num_results": num_results,
+            "created_at": datetime.utcnow()
+        }
+
+# Insights extracted from a single article, shared across search terms
+class ArticleInsightModel:
+    collection_name = "article_insights"
+    # Article content doesn't change, so entries can live much longer than
+    # search-term cache entries
+    ttl_seconds = 7 * 86400
+
+    @staticmethod
+    async def create_indexes(db: AsyncIOMotorDatabase):
+        """Create necessary indexes for the ArticleInsight collection."""
+        collection = db[ArticleInsightModel.collection_name]
+        await collection.create_index("article_key", unique=True)
+        await collection.create_index(
             "created_at",
-            expireAfterSeconds=86400
+            expireAfterSeconds=ArticleInsightModel.ttl_seconds
         )
 
     @staticmethod
-    def to_document(search_term: str, insights: list, num_results: int) -> Dict[str, Any]:
+    def to_document(article_key: str, link: str, insights: list) -> Dict[str, Any]:
         return {
-            "search_term": search_term,
+            "article_key": article_key,
+            "link": link,
             "insights": insights,
-            "num_results": num_results,
-            "created_at": datetime
-        }
\ No newline at end of file
+            "created_at": datetime.utcnow()
+        }
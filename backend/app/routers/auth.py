@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import ValidationError
 from ..mongodb.config import get_db
 from ..schemas.auth import Token, UserRegister
@@ -11,13 +11,13 @@ from datetime import timedelta
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=Token)
-async def register(user_data: UserRegister, db: Database = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Register a new user."""
     try:
         # Add detailed logging
         print(f"Registration attempt with email: {user_data.email}, username: {user_data.username}")
 
-        user = create_user(
+        user = await create_user(
             db=db,
             email=user_data.email,
             username=user_data.username,
@@ -48,9 +48,9 @@ async def register(user_data: UserRegister, db: Database = Depends(get_db)):
         )
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Database = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncIOMotorDatabase = Depends(get_db)):
     """Login for access token."""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
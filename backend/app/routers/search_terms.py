@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pymongo.database import Database
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import List, Optional
 from ..mongodb.config import get_db
-from ..schemas.search_term import SearchTerm, SearchTermCreate
-from ..services.search_term_service import get_user_search_terms, create_search_term, delete_search_term
+from ..schemas.search_term import (
+    SearchTerm, SearchTermCreate, SearchTermBulkCreate, SearchTermBulkDelete, SearchTermBulkResult
+)
+from ..services.search_term_service import (
+    get_user_search_terms, create_search_term, delete_search_term,
+    create_search_terms, delete_search_terms, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+)
 from ..utils.security import get_current_user
 from bson import ObjectId
 
@@ -11,42 +16,88 @@ router = APIRouter(prefix="/search-terms", tags=["search terms"])
 
 @router.get("/", response_model=List[SearchTerm])
 async def read_user_search_terms(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
-    db: Database = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
-    Get all search terms for the currently logged in user.
+    Get the search terms of the currently logged in user, newest first.
+    Without limit or cursor every term is returned; otherwise a page of limit
+    terms (DEFAULT_PAGE_SIZE by default), and if more remain, the X-Next-Cursor
+    header holds the cursor for the next page.
     Requires authentication.
     """
-    search_terms = get_user_search_terms(db, str(current_user["_id"]))
+    if limit is None and cursor:
+        limit = DEFAULT_PAGE_SIZE
+    try:
+        search_terms, next_cursor = await get_user_search_terms(
+            db, str(current_user["_id"]), limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return search_terms
 
 @router.post("/", response_model=SearchTerm)
 async def create_user_search_term(
     search_term: SearchTermCreate,
     current_user: dict = Depends(get_current_user),
-    db: Database = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Create a new search term for the currently logged in user.
     Requires authentication.
     """
-    result = create_search_term(db, search_term.term, str(current_user["_id"]))
+    result = await create_search_term(db, search_term.term, str(current_user["_id"]))
     if isinstance(result.get("_id"), ObjectId):
         result["_id"] = str(result["_id"])
     return result
 
+def _bulk_result(outcomes, success_status: str) -> dict:
+    succeeded = sum(1 for outcome in outcomes if outcome["status"] == success_status)
+    return {"results": outcomes, "succeeded": succeeded, "failed": len(outcomes) - succeeded}
+
+@router.post("/bulk", response_model=SearchTermBulkResult, response_model_exclude_none=True)
+async def create_user_search_terms(
+    request: SearchTermBulkCreate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Create many search terms in one request, e.g. to import a watchlist.
+    Terms the user already has are reported as duplicates.
+    Requires authentication.
+    """
+    outcomes = await create_search_terms(db, request.terms, str(current_user["_id"]))
+    return _bulk_result(outcomes, "created")
+
+@router.post("/bulk-delete", response_model=SearchTermBulkResult, response_model_exclude_none=True)
+async def delete_user_search_terms(
+    request: SearchTermBulkDelete,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Delete many search terms in one request.
+    Requires authentication.
+    """
+    outcomes = await delete_search_terms(db, request.ids, str(current_user["_id"]))
+    return _bulk_result(outcomes, "deleted")
+
 @router.delete("/{search_term_id}", response_model=dict)
 async def delete_user_search_term(
     search_term_id: str,
     current_user: dict = Depends(get_current_user),
-    db: Database = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Delete a search term.
     Requires authentication.
     """
-    result = delete_search_term(db, search_term_id, str(current_user["_id"]))
+    result = await delete_search_term(db, search_term_id, str(current_user["_id"]))
     if not result:
         raise HTTPException(status_code=404, detail="Search term not found")
     return {"message": "Search term deleted successfully"}
\ No newline at end of file
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from ..mongodb.config import get_db
 from ..schemas.auth import UserBase
@@ -2,7 +2,7 @@ from pydantic import BaseModel, Field, GetJsonSchemaHandler
 from pydantic.json_schema import JsonSchemaValue
 from pydantic_core import core_schema
 from datetime import datetime
-from typing import Optional, Any, Dict, Annotated
+from typing import Optional, Any, Dict, Annotated, List
 from bson import ObjectId
 
 # More robust ObjectId handling for Pydantic v2
@@ -48,4 +48,25 @@ class SearchTerm(SearchTermBase):
                 "user_id": "60d5ec9af3c56a289b54321",
                 "created_at": "2023-01-01T00:00:00.000Z"
             }
-        }
\ No newline at end of file
+        }
+
+# Upper bound on the items accepted by one bulk request
+MAX_BULK_ITEMS = 1000
+
+class SearchTermBulkCreate(BaseModel):
+    terms: List[str] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class SearchTermBulkDelete(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class SearchTermBulkItem(BaseModel):
+    """Outcome for one item of a bulk request."""
+    term: Optional[str] = None
+    id: Optional[str] = None
+    # created | duplicate | deleted | not_found | invalid | error
+    status: str
+
+class SearchTermBulkResult(BaseModel):
+    results: List[SearchTermBulkItem]
+    succeeded: int
+    failed: int
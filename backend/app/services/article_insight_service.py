@@ -0,0 +1,93 @@
+import hashlib
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import List, Dict, Any, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from ..mongodb.models import ArticleInsightModel
+from . import write_behind_service
+
+# Query parameters that only track where a click came from
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ocid", "cmpid")
+
+def normalize_url(url: str) -> str:
+    """Canonical form of an article URL (scheme/host case, www, fragment, tracking params)."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    ))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, query, ""))
+
+def article_key(article: Dict[str, Any]) -> str:
+    """Content address of an article: its normalized URL plus a hash of its snippet."""
+    snippet = " ".join(article.get("snippet", "").split()).lower()
+    snippet_hash = hashlib.sha1(snippet.encode("utf-8")).hexdigest()
+    url = normalize_url(article.get("link", ""))
+    return hashlib.sha256(f"{url}\n{snippet_hash}".encode("utf-8")).hexdigest()
+
+async def get_article_insights(db: AsyncIOMotorDatabase, articles: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Get stored insights for the given articles, keyed by article_key."""
+    keys = list({article_key(article) for article in articles})
+    if not keys:
+        return {}
+
+    cursor = db[ArticleInsightModel.collection_name].find(
+        # Empty results stored by earlier versions don't count as known
+        {"article_key": {"$in": keys}, "insights.0": {"$exists": True}},
+        projection={"_id": 0, "article_key": 1, "insights": 1}
+    )
+    return {doc["article_key"]: doc["insights"] async for doc in cursor}
+
+def group_insights_by_article(
+    articles: List[Dict[str, Any]], insights: List[Dict[str, Any]]
+) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Attribute insights to the articles they cite.
+
+    Returns:
+        Tuple: insights keyed by article_key (every article gets an entry, even
+        if empty), and insights whose source_link matched none of the articles
+    """
+    key_by_url = {}
+    by_article = {}
+    for article in articles:
+        key = article_key(article)
+        key_by_url.setdefault(normalize_url(article.get("link", "")), key)
+        by_article[key] = []
+    # An insight may cite one of the syndicated copies merged into an article
+    for article in articles:
+        for link in article.get("links", [])[1:]:
+            key_by_url.setdefault(normalize_url(link), article_key(article))
+
+    unattributed = []
+    for insight in insights:
+        key = key_by_url.get(normalize_url(insight.get("source_link", "")))
+        if key is None:
+            unattributed.append(insight)
+        else:
+            by_article[key].append(insight)
+    return by_article, unattributed
+
+async def save_article_insights(db: AsyncIOMotorDatabase, articles: List[Dict[str, Any]], by_article: Dict[str, List[Dict[str, Any]]]) -> None:
+    """
+    Store per-article insights.
+
+    Articles with no insights are skipped: the model may just have left them
+    out of its answer, so they are sent again next time. Writes go through
+    the write-behind queue.
+    """
+    link_by_key = {article_key(article): article.get("link", "") for article in articles}
+    operations = [
+        UpdateOne(
+            {"article_key": key},
+            {"$set": ArticleInsightModel.to_document(key, link_by_key.get(key, ""), insights)},
+            upsert=True
+        )
+        for key, insights in by_article.items()
+        if insights
+    ]
+    await write_behind_service.enqueue(db, ArticleInsightModel.collection_name, operations)
@@ -1,33 +1,505 @@
 # services/cache_service.py
-from pymongo.database import Database
+import asyncio
+import hashlib
+import json
+import os
+import time
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import Binary
+from pymongo import UpdateOne
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from ..utils.search_keys import normalize_search_term
+from ..utils.ttl_cache import TTLCache
+from ..utils.semantic_index import SemanticIndex
+from ..utils.cache_codec import FORMAT_VERSION, encode_insights, decode_insights
+from ..utils.insights_json import serialize_insights
+from ..utils import metrics
+from . import write_behind_service
+
+# How long a cached answer is considered fresh
+CACHE_FRESHNESS = timedelta(minutes=30)
+# How long past freshness an entry may still be served while it is refreshed
+CACHE_STALE_GRACE = timedelta(seconds=int(os.getenv("CACHE_STALE_GRACE_SECONDS", "1800")))
+# How long Mongo keeps an entry (TTL index). Freshness and grace decide what
+# is served normally; past them an entry only serves as a fallback while an
+# upstream is down, so this must stay well beyond the grace window.
+CACHE_RETENTION = timedelta(seconds=int(os.getenv("CACHE_RETENTION_SECONDS", str(24 * 60 * 60))))
+
+# Answers for fewer articles than an entry holds that are kept with it
+MAX_TRUNCATED_ANSWERS = 3
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    """
+    Approximate in-memory footprint of a cached entry: its body plus the
+    decoded insights, and the same again for each memoized truncated answer.
+    """
+    size = 2 * len(entry["body"])
+    for _, body, _ in entry.get("answers", {}).values():
+        if body is not entry["body"]:
+            size += 2 * len(body)
+    return size
+
+# In-process tier consulted before the Mongo `cache` collection. It is keyed
+# by canonical key and holds the largest usable entry seen for that key.
+local_cache = TTLCache(
+    max_entries=int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "1000")),
+    max_bytes=int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=(CACHE_FRESHNESS + CACHE_STALE_GRACE).total_seconds(),
+    sizeof=_entry_size,
+)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+# Minimum cosine similarity for a differently-worded term to share an answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+
+# Index over the canonical keys of fresh cache entries, used to answer
+# paraphrased search terms from an existing entry
+semantic_index = SemanticIndex(
+    max_terms=int(os.getenv("SEMANTIC_CACHE_MAX_TERMS", "100000")),
+    # Largest weight that words in only one of two matched terms may carry
+    max_unshared_weight=float(os.getenv("SEMANTIC_CACHE_MAX_UNSHARED_WEIGHT", "0.1"))
+)
+_semantic_pruned_at = 0.0
+
+# How long the `cache` collection size reported by /api/cache/stats is reused
+STORAGE_STATS_TTL = timedelta(seconds=int(os.getenv("STORAGE_STATS_TTL_SECONDS", "300")))
+_storage_stats = TTLCache(max_entries=1, ttl_seconds=STORAGE_STATS_TTL.total_seconds())
+_storage_stats_lock = asyncio.Lock()
+
+def insights_etag(insights: List[Dict[str, Any]]) -> str:
+    """Content hash identifying a list of insights, for ETag headers."""
+    canonical = json.dumps(insights, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:20]
+
+def truncate_insights(insights: List[Dict[str, Any]], num_results: int) -> List[Dict[str, Any]]:
+    """Keep only the insights drawn from the first num_results distinct sources."""
+    kept_links = set()
+    truncated = []
+    for insight in insights:
+        link = insight.get("source_link")
+        if link not in kept_links:
+            if len(kept_links) >= num_results:
+                continue
+            kept_links.add(link)
+        truncated.append(insight)
+    return truncated
+
+def _answer_from(entry: Dict[str, Any], num_results: int) -> Tuple[List[Dict[str, Any]], bytes, str]:
+    """
+    Serve a request for num_results from an entry covering at least as many.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], bytes, str]: Insights, serialized response
+        body and ETag. They are worked out once per entry and num_results (for
+        up to MAX_TRUNCATED_ANSWERS smaller num_results), so repeated hits
+        skip truncating, hashing and encoding.
+    """
+    answers = entry.setdefault("answers", {})
+    answer = answers.get(num_results)
+    if answer is not None:
+        return answer
+
+    if entry["num_results"] == num_results:
+        insights = entry["insights"]
+        body = entry.get("body") or serialize_insights(insights)
+        etag = entry.get("etag") or insights_etag(insights)
+        answers[num_results] = (insights, body, etag)
+        return answers[num_results]
+
+    # The stored body and hash describe the full entry
+    insights = truncate_insights(entry["insights"], num_results)
+    answer = (insights, serialize_insights(insights), insights_etag(insights))
+    truncated = sum(1 for n in answers if n != entry["num_results"])
+    if truncated < MAX_TRUNCATED_ANSWERS:
+        answers[num_results] = answer
+        cache_key = entry.get("cache_key")
+        # The local tier sized the entry before this answer was added
+        if cache_key is not None and local_cache.peek(cache_key) is entry:
+            local_cache.resize(cache_key)
+    return answer
+
+async def lookup_insights(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> Optional[Dict[str, Any]]:
+    """
+    Find a usable cache entry for a search term.
+
+    Search terms are matched on their canonical key, and an entry built from
+    more articles also answers requests for fewer. Entries past the freshness
+    window are still returned (with stale=True) during the grace window. If
+    nothing matches the key, a fresh entry for a similarly worded term is used.
+
+    Returns:
+        Optional[Dict[str, Any]]: insights, body (the insights as JSON bytes,
+        ready to send), created_at, age_seconds, stale and etag (plus
+        similarity for paraphrase matches), or None if nothing usable is
+        cached
+    """
+    cache_key = normalize_search_term(search_term)
+
+    with metrics.STAGE_LATENCY.time(stage="get_cached_insights"):
+        result = await _lookup_key(db, cache_key, num_results, allow_stale=True)
+        if result is None and SEMANTIC_CACHE_ENABLED:
+            result = await _lookup_similar(db, cache_key, num_results)
+
+    _count_lookup(result)
+    return result
+
+async def lookup_many_insights(db: AsyncIOMotorDatabase, search_terms: List[str], num_results: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Batch form of lookup_insights.
+
+    Terms are deduplicated on their canonical key, and every key the local
+    tier can't answer is looked up in a single `$in` query.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Lookup result (as from lookup_insights) by
+        canonical key, for the keys with a usable entry
+    """
+    cache_keys = list(dict.fromkeys(normalize_search_term(term) for term in search_terms))
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with metrics.STAGE_LATENCY.time(stage="get_cached_insights_batch"):
+        remote_keys = []
+        for cache_key in cache_keys:
+            result = _lookup_local(cache_key, num_results)
+            if result is None:
+                remote_keys.append(cache_key)
+            else:
+                results[cache_key] = result
+
+        if remote_keys:
+            cursor = db["cache"].find({
+                "cache_key": {"$in": remote_keys},
+                "num_results": {"$gte": num_results},
+                "created_at": {"$gt": _oldest_usable(allow_stale=True)}
+            }).sort("created_at", -1)
+            async for cache_entry in cursor:
+                cache_entry = _from_document(cache_entry)
+                cache_key = cache_entry["cache_key"]
+                # Newest first, so the first entry seen for a key wins
+                if cache_key not in results:
+                    results[cache_key] = _lookup_result(_remember(cache_key, cache_entry), num_results)
+
+        if SEMANTIC_CACHE_ENABLED:
+            for cache_key in cache_keys:
+                if cache_key not in results:
+                    result = await _lookup_similar(db, cache_key, num_results)
+                    if result is not None:
+                        results[cache_key] = result
+
+    for cache_key in cache_keys:
+        _count_lookup(results.get(cache_key))
+    return results
+
+def _count_lookup(result: Optional[Dict[str, Any]]) -> None:
+    if result is None:
+        metrics.CACHE_LOOKUPS.inc(result="miss")
+    elif "similarity" in result:
+        metrics.CACHE_LOOKUPS.inc(result="semantic")
+    else:
+        metrics.CACHE_LOOKUPS.inc(result="stale" if result["stale"] else "hit")
+
+def _oldest_usable(allow_stale: bool) -> datetime:
+    oldest_usable = datetime.utcnow() - CACHE_FRESHNESS
+    if allow_stale:
+        oldest_usable -= CACHE_STALE_GRACE
+    return oldest_usable
+
+def _lookup_local(cache_key: str, num_results: int) -> Optional[Dict[str, Any]]:
+    """Answer from the local tier if it holds a fresh, large enough entry."""
+    entry = local_cache.peek(cache_key)
+    if (
+        entry is not None
+        and entry["num_results"] >= num_results
+        and datetime.utcnow() - entry["created_at"] < CACHE_FRESHNESS
+    ):
+        # get() so the hit is counted and the key marked recently used
+        return _lookup_result(local_cache.get(cache_key), num_results)
+    # Stale local entries fall through: another worker may have refreshed it
+    local_cache.misses += 1
+    return None
+
+async def _lookup_key(db: AsyncIOMotorDatabase, cache_key: str, num_results: int, allow_stale: bool) -> Optional[Dict[str, Any]]:
+    """Look up one canonical key in the local tier, then in Mongo."""
+    result = _lookup_local(cache_key, num_results)
+    if result is not None:
+        return result
 
-def get_cached_insights(db: Database, search_term: str, num_results: int) -> Optional[List[Dict[str, Any]]]:
-    """Get cached insights if they exist and are less than 30 minutes old."""
     cache_collection = db["cache"]
 
-    thirty_minutes_ago = datetime.utcnow() - timedelta(minutes=30)  # Correct
+    # Any entry at least as large will do; take the newest one
+    cache_entry = await cache_collection.find_one(
+        {
+            "cache_key": cache_key,
+            "num_results": {"$gte": num_results},
+            "created_at": {"$gt": _oldest_usable(allow_stale)}
+        },
+        sort=[("created_at", -1)]
+    )
 
-    cache_entry = cache_collection.find_one({
-        "search_term": search_term,
-        "num_results": num_results,
-        "created_at": {"$gt": thirty_minutes_ago}
-    })
+    if cache_entry:
+        return _lookup_result(_remember(cache_key, _from_document(cache_entry)), num_results)
+    return None
 
+async def _lookup_similar(db: AsyncIOMotorDatabase, cache_key: str, num_results: int) -> Optional[Dict[str, Any]]:
+    """Answer from the fresh entry of the most similar differently-worded term."""
+    matches = semantic_index.query(
+        cache_key, k=3, threshold=SEMANTIC_CACHE_THRESHOLD, exclude=cache_key
+    )
+    for similar_key, similarity in matches:
+        result = await _lookup_key(db, similar_key, num_results, allow_stale=False)
+        if result is not None:
+            print(f"Semantic cache match: '{cache_key}' -> '{similar_key}' ({similarity:.2f})")
+            result["similarity"] = similarity
+            return result
+    return None
+
+async def lookup_last_known(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> Optional[Dict[str, Any]]:
+    """
+    Newest cache entry covering a request, however old (until Mongo expires it).
+
+    Used as a fallback while an upstream provider is unavailable, when an
+    outdated answer beats an error.
+
+    Returns:
+        Optional[Dict[str, Any]]: Lookup result as from lookup_insights, or None
+    """
+    cache_key = normalize_search_term(search_term)
+    entry = local_cache.peek(cache_key)
+    if entry is not None and entry["num_results"] >= num_results:
+        return _lookup_result(entry, num_results)
+
+    cache_entry = await db["cache"].find_one(
+        {"cache_key": cache_key, "num_results": {"$gte": num_results}},
+        sort=[("created_at", -1)]
+    )
     if cache_entry:
-        return cache_entry["insights"]
+        return _lookup_result(_from_document(cache_entry), num_results)
     return None
 
-def save_insights_to_cache(db: Database, search_term: str, insights: List[Dict[str, Any]], num_results: int) -> None:
-    """Save insights to cache."""
-    cache_collection = db["cache"]
+async def get_cached_insights(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> Optional[List[Dict[str, Any]]]:
+    """Get cached insights if they exist and are less than 30 minutes old."""
+    result = await lookup_insights(db, search_term, num_results)
+    if result and not result["stale"]:
+        return result["insights"]
+    return None
+
+async def save_insights_to_cache(db: AsyncIOMotorDatabase, search_term: str, insights: List[Dict[str, Any]], num_results: int) -> None:
+    """
+    Save insights to cache.
+
+    The local tier is updated immediately; the Mongo upsert goes through the
+    write-behind queue so the caller doesn't wait on it.
+    """
+    cache_key = normalize_search_term(search_term)
+    now = datetime.utcnow()
+
+    if SEMANTIC_CACHE_ENABLED:
+        _index_key(cache_key)
+
+    etag = insights_etag(insights)
+    _remember(cache_key, {
+        "num_results": num_results,
+        "insights": insights,
+        "created_at": now,
+        "etag": etag
+    })
+
+    with metrics.STAGE_LATENCY.time(stage="save_insights_to_cache"):
+        await write_behind_service.enqueue(db, "cache", [UpdateOne(
+            {"cache_key": cache_key, "num_results": num_results},
+            {"$set": {
+                "search_term": search_term,
+                "format": FORMAT_VERSION,
+                "payload": Binary(encode_insights(insights)),
+                "created_at": now,
+                "etag": etag
+            }, "$unset": {"insights": ""}},
+            upsert=True
+        )])
+
+async def get_entry_age(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> Optional[float]:
+    """Age in seconds of the newest cache entry covering a request, or None if there isn't one."""
+    cache_entry = await db["cache"].find_one(
+        {
+            "cache_key": normalize_search_term(search_term),
+            "num_results": {"$gte": num_results}
+        },
+        projection={"created_at": 1},
+        sort=[("created_at", -1)]
+    )
+    if not cache_entry:
+        return None
+    return (datetime.utcnow() - cache_entry["created_at"]).total_seconds()
+
+def _from_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Read a `cache` document in either the compact or the original format."""
+    if doc.get("format") == FORMAT_VERSION:
+        insights = decode_insights(doc["payload"])
+    else:
+        insights = doc["insights"]
+    return {
+        "cache_key": doc.get("cache_key"),
+        "num_results": doc["num_results"],
+        "insights": insights,
+        "created_at": doc["created_at"],
+        "etag": doc.get("etag")
+    }
+
+def _lookup_result(entry: Dict[str, Any], num_results: int) -> Dict[str, Any]:
+    """Describe a cache entry as an answer for num_results."""
+    age = datetime.utcnow() - entry["created_at"]
+    insights, body, etag = _answer_from(entry, num_results)
+    return {
+        "insights": insights,
+        "body": body,
+        "created_at": entry["created_at"],
+        "age_seconds": max(0, int(age.total_seconds())),
+        "stale": age >= CACHE_FRESHNESS,
+        "etag": etag
+    }
+
+def _remember(cache_key: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Put an entry in the local tier unless a larger fresh one is already there.
+
+    Returns:
+        Dict[str, Any]: The entry to answer from, with its response body
+    """
+    age = datetime.utcnow() - entry["created_at"]
+    current = local_cache.peek(cache_key)
+    if (
+        current is not None
+        and current["num_results"] > entry["num_results"]
+        and datetime.utcnow() - current["created_at"] < CACHE_FRESHNESS
+    ):
+        return entry
+
+    remaining = (CACHE_FRESHNESS + CACHE_STALE_GRACE - age).total_seconds()
+    local_entry = {
+        "cache_key": cache_key,
+        "num_results": entry["num_results"],
+        "insights": entry["insights"],
+        # Validated and encoded once, then sent as is on every hit
+        "body": entry.get("body") or serialize_insights(entry["insights"]),
+        "created_at": entry["created_at"],
+        # Entries written before ETags were added get one here
+        "etag": entry.get("etag") or insights_etag(entry["insights"])
+    }
+    local_cache.set(cache_key, local_entry, remaining)
+    return local_entry
+
+def _index_key(cache_key: str) -> None:
+    """Add a key to the semantic index, dropping keys too old to be fresh."""
+    global _semantic_pruned_at
+    semantic_index.add(cache_key)
+
+    now = time.monotonic()
+    if now - _semantic_pruned_at > 60:
+        semantic_index.prune(CACHE_FRESHNESS.total_seconds())
+        _semantic_pruned_at = now
+
+async def load_semantic_index(db: AsyncIOMotorDatabase) -> int:
+    """Index the keys of every fresh cache entry (called on startup)."""
+    if not SEMANTIC_CACHE_ENABLED:
+        return 0
+
+    cursor = db["cache"].find(
+        {"created_at": {"$gt": datetime.utcnow() - CACHE_FRESHNESS}},
+        projection={"_id": 0, "cache_key": 1}
+    )
+    count = 0
+    async for doc in cursor:
+        if doc.get("cache_key"):
+            semantic_index.add(doc["cache_key"])
+            count += 1
+    return count
+
+async def remove_unkeyed_entries(db: AsyncIOMotorDatabase) -> int:
+    """
+    Delete `cache` documents written before entries had a cache_key.
+
+    Lookups never match them, so they only take up space.
+
+    Returns:
+        int: Number of documents deleted
+    """
+    result = await db["cache"].delete_many({"cache_key": {"$exists": False}})
+    return result.deleted_count
+
+async def migrate_legacy_entries(db: AsyncIOMotorDatabase, batch_size: int = 500) -> int:
+    """
+    Rewrite `cache` documents still in the original format in the compact one.
+
+    Returns:
+        int: Number of documents rewritten
+    """
+    cursor = db["cache"].find(
+        {"format": {"$exists": False}},
+        projection={"insights": 1, "etag": 1}
+    )
+    migrated = 0
+    operations = []
+    async for doc in cursor:
+        insights = doc.get("insights") or []
+        operations.append(UpdateOne(
+            # Skip documents an upsert rewrote in the meantime
+            {"_id": doc["_id"], "format": {"$exists": False}},
+            {"$set": {
+                "format": FORMAT_VERSION,
+                "payload": Binary(encode_insights(insights)),
+                "etag": doc.get("etag") or insights_etag(insights)
+            }, "$unset": {"insights": ""}}
+        ))
+        if len(operations) >= batch_size:
+            migrated += (await db["cache"].bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        migrated += (await db["cache"].bulk_write(operations, ordered=False)).modified_count
+    return migrated
+
+async def get_storage_stats(db: AsyncIOMotorDatabase) -> Dict[str, int]:
+    """
+    Size of the `cache` collection as reported by collStats.
+
+    Returns:
+        Dict[str, int]: Document count and data, on-disk and index sizes in
+        bytes, or an empty dict if the server doesn't report them
+    """
+    try:
+        stats = await db.command({"collStats": "cache"})
+    except Exception as e:
+        print(f"Failed to read cache storage stats: {e}")
+        return {}
+    return {
+        "count": int(stats.get("count", 0)),
+        "size_bytes": int(stats.get("size", 0)),
+        "avg_document_bytes": int(stats.get("avgObjSize", 0)),
+        "storage_bytes": int(stats.get("storageSize", 0)),
+        "index_bytes": int(stats.get("totalIndexSize", 0)),
+    }
+
+async def get_recent_storage_stats(db: AsyncIOMotorDatabase) -> Dict[str, int]:
+    """
+    Like get_storage_stats, but reuse the last result for STORAGE_STATS_TTL.
+
+    Used by the unauthenticated stats endpoint, so requests can't run
+    collStats against the database more than once per interval.
+    """
+    async with _storage_stats_lock:
+        stats = _storage_stats.get("cache")
+        if stats is None:
+            stats = await get_storage_stats(db)
+            _storage_stats.set("cache", stats)
+        return stats
+
+def get_cache_stats() -> Dict[str, int]:
+    """Get hit/miss/eviction counters for the in-process cache tier."""
+    return {**local_cache.stats(), "semantic_index_terms": len(semantic_index)}
+
+def _collect_metrics() -> None:
+    """Copy local tier counters into the /metrics gauges."""
+    for stat, value in get_cache_stats().items():
+        metrics.LOCAL_CACHE.set(value, stat=stat)
 
-    cache_collection.update_one(
-        {"search_term": search_term, "num_results": num_results},
-        {"$set": {
-            "insights": insights,
-            "created_at": datetime.utcnow()
-        }},
-        upsert=True
-    )
\ No newline at end of file
+metrics.REGISTRY.add_collector(_collect_metrics)
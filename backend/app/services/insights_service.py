@@ -0,0 +1,290 @@
+import asyncio
+import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import List, Dict, Any, Set, AsyncIterator, Callable, Tuple, Optional
+from ..utils.single_flight import SingleFlight, Broadcast
+from ..utils.admission import AdmissionRejected, priority, PRIORITY_BATCH, PRIORITY_BACKGROUND
+from ..utils.resilience import CircuitOpen, UpstreamError
+from ..utils.search_keys import normalize_search_term
+from ..utils.fetch_google_results import fetch_google_search_results
+from ..utils.summarize import (
+    summarize_with_openai, stream_insights_with_openai, select_articles_for_prompt
+)
+from ..utils.dedupe_articles import collapse_near_duplicates
+from . import cache_service, article_insight_service
+
+# Coalesces concurrent refreshes for the same search term
+insights_flight = SingleFlight()
+# Insights of the streaming pipeline runs in progress, by flight key
+_streams: Dict[Tuple[str, int], Broadcast] = {}
+
+# Strong references to background refreshes so they aren't garbage collected
+_background_refreshes: Set[asyncio.Task] = set()
+
+# Cache misses from one batch request that may run the pipeline at once
+BATCH_CONCURRENCY = int(os.getenv("BATCH_INSIGHTS_CONCURRENCY", "4"))
+
+async def _split_known_articles(
+    db: AsyncIOMotorDatabase, articles: List[Dict[str, Any]]
+) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Look up stored per-article insights and list the articles that have none."""
+    known = await article_insight_service.get_article_insights(db, articles)
+    new_articles = [
+        article for article in articles
+        if article_insight_service.article_key(article) not in known
+    ]
+    return known, new_articles
+
+async def generate_insights(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> List[Dict[str, Any]]:
+    """
+    Fetch news for a search term and extract insights, reusing per-article results.
+
+    Articles already summarized for any search term take their insights from
+    the article store; only never-seen articles are sent to OpenAI.
+    """
+    articles = await fetch_google_search_results(search_term, num_results)
+
+    if not articles:
+        print(f"No recent news found for '{search_term}'")
+        return []
+
+    articles = collapse_near_duplicates(articles)
+
+    known, new_articles = await _split_known_articles(db, articles)
+    # Only summarize (and store) what fits in the prompt, so articles left
+    # out aren't recorded as having no insights
+    new_articles = select_articles_for_prompt(new_articles, search_term)
+
+    by_article = dict(known)
+    unattributed = []
+    if new_articles:
+        print(f"Summarizing {len(new_articles)} new of {len(articles)} articles for '{search_term}'")
+        new_insights = await summarize_with_openai(new_articles, search_term)
+        if new_insights:
+            new_by_article, unattributed = article_insight_service.group_insights_by_article(
+                new_articles, new_insights
+            )
+            await article_insight_service.save_article_insights(db, new_articles, new_by_article)
+            by_article.update(new_by_article)
+
+    # Keep search-result order so the most relevant articles come first
+    insights = []
+    for article in articles:
+        insights.extend(by_article.pop(article_insight_service.article_key(article), []))
+    insights.extend(unattributed)
+
+    if not insights:
+        print("No valid insights were generated")
+
+    return insights
+
+def _flight_key(search_term: str, num_results: int):
+    return (normalize_search_term(search_term), num_results)
+
+async def refresh_insights(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> List[Dict[str, Any]]:
+    """
+    Run the Google + OpenAI pipeline for a search term and cache the result.
+
+    Only the first caller for a key hits the upstream APIs; concurrent callers
+    for the same key wait on that call instead.
+    """
+    async def fetch_and_cache():
+        insights = await generate_insights(db, search_term, num_results)
+        if insights:
+            await cache_service.save_insights_to_cache(
+                db, search_term, insights, num_results
+            )
+        return insights
+
+    return await insights_flight.do(_flight_key(search_term, num_results), fetch_and_cache)
+
+def schedule_refresh(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> bool:
+    """
+    Refresh a search term in the background unless a refresh is already running.
+
+    Returns:
+        bool: True if a new refresh was started
+    """
+    if insights_flight.in_flight(_flight_key(search_term, num_results)):
+        return False
+
+    async def run():
+        try:
+            # The caller already has an answer, so this waits behind
+            # interactive requests for upstream capacity
+            with priority(PRIORITY_BACKGROUND):
+                await refresh_insights(db, search_term, num_results)
+        except Exception as e:
+            print(f"Background refresh failed for '{search_term}': {e}")
+
+    task = asyncio.create_task(run())
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+    return True
+
+async def stream_insights(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Like refresh_insights, but yield each insight as soon as it is available.
+
+    Insights already stored for known articles come first, then new ones as
+    OpenAI generates them. Concurrent streams for the same key share one
+    pipeline run, and every client gets all of its insights. The assembled
+    list is cached only if the OpenAI stream completed; a failed or truncated
+    one raises UpstreamError after the insights received so far, and nothing
+    is saved.
+    """
+    key = _flight_key(search_term, num_results)
+    broadcast = _streams.get(key)
+    if broadcast is None:
+        if insights_flight.in_flight(key):
+            # A non-streaming refresh is already generating this answer; wait
+            # for it instead of paying for a second pipeline run
+            for insight in await refresh_insights(db, search_term, num_results):
+                yield insight
+            return
+        broadcast = _start_stream(db, search_term, num_results)
+
+    async for insight in broadcast.subscribe():
+        yield insight
+
+def _start_stream(db: AsyncIOMotorDatabase, search_term: str, num_results: int) -> Broadcast:
+    """Run the streaming pipeline as the key's single flight, publishing each insight."""
+    key = _flight_key(search_term, num_results)
+    broadcast = Broadcast()
+    _streams[key] = broadcast
+
+    async def run():
+        try:
+            insights = await _stream_pipeline(db, search_term, num_results, broadcast.publish)
+        except BaseException as e:
+            broadcast.close(e)
+            raise
+        finally:
+            _streams.pop(key, None)
+        broadcast.close()
+        return insights
+
+    # Registered with insights_flight so refresh_insights callers join it too
+    task = insights_flight.start(key, run)
+    # Stream readers get the error through the broadcast
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return broadcast
+
+async def _stream_pipeline(
+    db: AsyncIOMotorDatabase,
+    search_term: str,
+    num_results: int,
+    publish: Callable[[Dict[str, Any]], None]
+) -> List[Dict[str, Any]]:
+    """The pipeline behind stream_insights; each insight is passed to publish as it arrives."""
+    articles = await fetch_google_search_results(search_term, num_results)
+    if not articles:
+        print(f"No recent news found for '{search_term}'")
+        return []
+
+    articles = collapse_near_duplicates(articles)
+
+    known, new_articles = await _split_known_articles(db, articles)
+    # Only summarize (and store) what fits in the prompt, so articles left
+    # out aren't recorded as having no insights
+    new_articles = select_articles_for_prompt(new_articles, search_term)
+
+    insights = []
+    for article in articles:
+        for insight in known.get(article_insight_service.article_key(article), []):
+            insights.append(insight)
+            publish(insight)
+
+    if new_articles:
+        new_insights = []
+        async for insight in stream_insights_with_openai(new_articles, search_term):
+            new_insights.append(insight)
+            insights.append(insight)
+            publish(insight)
+
+        if new_insights:
+            new_by_article, _ = article_insight_service.group_insights_by_article(
+                new_articles, new_insights
+            )
+            await article_insight_service.save_article_insights(db, new_articles, new_by_article)
+
+    if insights:
+        await cache_service.save_insights_to_cache(db, search_term, insights, num_results)
+    return insights
+
+def _batch_result(search_term: str, insights: List[Dict[str, Any]], cache: str, age_seconds: int, error: Optional[str] = None) -> Dict[str, Any]:
+    result = {"search_term": search_term, "insights": insights, "cache": cache, "age_seconds": age_seconds}
+    if error is not None:
+        result["error"] = error
+    return result
+
+async def batch_insights(
+    db: AsyncIOMotorDatabase,
+    search_terms: List[str],
+    num_results: int,
+    concurrency: int = BATCH_CONCURRENCY
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Get insights for many search terms, yielding each result as it is ready.
+
+    Terms are deduplicated on their canonical key. Cached answers for every
+    key come from one batched lookup and are yielded first; misses then run
+    through refresh_insights (at most `concurrency` at a time) and are yielded
+    as they finish. Each input term gets one result, with search_term,
+    insights, cache (HIT, STALE or MISS), age_seconds and, if its pipeline
+    failed, error.
+    """
+    terms_by_key: Dict[str, List[str]] = {}
+    for term in search_terms:
+        terms_by_key.setdefault(normalize_search_term(term), []).append(term)
+
+    cached = await cache_service.lookup_many_insights(
+        db, [terms[0] for terms in terms_by_key.values()], num_results
+    )
+
+    misses = []
+    for cache_key, terms in terms_by_key.items():
+        result = cached.get(cache_key)
+        if result is None:
+            misses.append(terms)
+            continue
+        if result["stale"]:
+            schedule_refresh(db, terms[0], num_results)
+        cache = "STALE" if result["stale"] else "HIT"
+        for term in terms:
+            yield _batch_result(term, result["insights"], cache, result["age_seconds"])
+
+    if not misses:
+        return
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(terms: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+        async with semaphore:
+            try:
+                with priority(PRIORITY_BATCH):
+                    insights = await refresh_insights(db, terms[0], num_results)
+                return terms, _batch_result(terms[0], insights, "MISS", 0)
+            except (AdmissionRejected, CircuitOpen, UpstreamError) as e:
+                # An upstream is saturated, down or failing: fall back to an outdated answer
+                fallback = await cache_service.lookup_last_known(db, terms[0], num_results)
+                if fallback:
+                    return terms, _batch_result(terms[0], fallback["insights"], "STALE", fallback["age_seconds"])
+                # These messages name the provider and nothing else
+                return terms, _batch_result(terms[0], [], "MISS", 0, str(e))
+            except Exception as e:
+                # The error text can include upstream URLs and keys, so it is only logged
+                print(f"Batch refresh failed for '{terms[0]}': {e!r}")
+                return terms, _batch_result(terms[0], [], "MISS", 0, "Internal error")
+
+    tasks = [asyncio.create_task(run(terms)) for terms in misses]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            terms, result = await next_done
+            for term in terms:
+                yield {**result, "search_term": term}
+    finally:
+        # The client went away; shared refreshes keep running for other waiters
+        for task in tasks:
+            task.cancel()
+
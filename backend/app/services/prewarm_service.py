@@ -0,0 +1,152 @@
+import asyncio
+import math
+import os
+import time
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import List, Dict, Any, Optional, Tuple
+from ..mongodb.models import SearchTermModel
+from ..utils.search_keys import normalize_search_term
+from ..utils.admission import AdmissionRejected, priority, PRIORITY_BACKGROUND
+from . import cache_service, insights_service
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+# How often the scheduler wakes up
+PREWARM_INTERVAL_SECONDS = int(os.getenv("PREWARM_INTERVAL_SECONDS", "60"))
+# Refresh entries this long before they stop being fresh
+PREWARM_LEAD_SECONDS = int(os.getenv("PREWARM_LEAD_SECONDS", "300"))
+# Maximum pipeline runs (one Google + one OpenAI call each) per interval
+PREWARM_BUDGET = int(os.getenv("PREWARM_BUDGET", "10"))
+# How many top-ranked terms to consider each interval
+PREWARM_CANDIDATES = int(os.getenv("PREWARM_CANDIDATES", "50"))
+# Recent request counts halve every this many seconds
+PREWARM_HALF_LIFE_SECONDS = int(os.getenv("PREWARM_HALF_LIFE_SECONDS", "1800"))
+# num_results used for saved terms, matching the /api/insights default
+DEFAULT_NUM_RESULTS = 5
+
+_DECAY_RATE = math.log(2) / PREWARM_HALF_LIFE_SECONDS
+# Decayed scores below this are forgotten
+_MIN_SCORE = 0.05
+_MAX_TRACKED_TERMS = 10000
+
+# cache key -> [decayed score, last update, search term, num_results]
+_recent_requests: Dict[str, List[Any]] = {}
+
+_scheduler_task: Optional[asyncio.Task] = None
+
+def _decayed(score: float, since: float, now: float) -> float:
+    return score * math.exp(-_DECAY_RATE * (now - since))
+
+def record_request(search_term: str, num_results: int) -> None:
+    """Count a request for a search term towards its recent popularity."""
+    now = time.monotonic()
+    cache_key = normalize_search_term(search_term)
+    entry = _recent_requests.get(cache_key)
+    if entry is None:
+        if len(_recent_requests) >= _MAX_TRACKED_TERMS:
+            _forget_unpopular(now)
+        _recent_requests[cache_key] = [1.0, now, search_term, num_results]
+        return
+
+    entry[0] = _decayed(entry[0], entry[1], now) + 1.0
+    entry[1] = now
+    entry[3] = max(entry[3], num_results)
+
+def _forget_unpopular(now: float) -> None:
+    """Drop tracked terms whose decayed score has become negligible."""
+    for cache_key, entry in list(_recent_requests.items()):
+        if _decayed(entry[0], entry[1], now) < _MIN_SCORE:
+            del _recent_requests[cache_key]
+    if len(_recent_requests) >= _MAX_TRACKED_TERMS:
+        # Still full: drop the least popular half
+        ranked = sorted(_recent_requests.items(), key=lambda item: _decayed(item[1][0], item[1][1], now))
+        for cache_key, _ in ranked[:len(ranked) // 2]:
+            del _recent_requests[cache_key]
+
+async def rank_terms(db: AsyncIOMotorDatabase, limit: int = PREWARM_CANDIDATES) -> List[Tuple[str, int, float]]:
+    """
+    Rank search terms by how many users saved them plus recent request frequency.
+
+    Returns:
+        List[Tuple[str, int, float]]: (search_term, num_results, score), best first
+    """
+    now = time.monotonic()
+    candidates: Dict[str, List[Any]] = {}
+
+    for cache_key, (score, updated, search_term, num_results) in _recent_requests.items():
+        candidates[cache_key] = [search_term, num_results, _decayed(score, updated, now)]
+
+    pipeline = [
+        {"$group": {"_id": "$term", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ]
+    async for doc in db[SearchTermModel.collection_name].aggregate(pipeline):
+        cache_key = normalize_search_term(doc["_id"])
+        if cache_key in candidates:
+            candidates[cache_key][2] += doc["count"]
+        else:
+            candidates[cache_key] = [doc["_id"], DEFAULT_NUM_RESULTS, float(doc["count"])]
+
+    ranked = sorted(candidates.values(), key=lambda c: c[2], reverse=True)
+    return [tuple(c) for c in ranked[:limit]]
+
+async def prewarm_once(db: AsyncIOMotorDatabase, budget: int = PREWARM_BUDGET) -> int:
+    """
+    Refresh popular terms whose cache entries are about to lapse.
+
+    Returns:
+        int: Number of terms refreshed
+    """
+    refresh_after = cache_service.CACHE_FRESHNESS.total_seconds() - PREWARM_LEAD_SECONDS
+    refreshed = 0
+
+    for search_term, num_results, _ in await rank_terms(db):
+        if refreshed >= budget:
+            break
+
+        age = await cache_service.get_entry_age(db, search_term, num_results)
+        if age is not None and age < refresh_after:
+            continue
+
+        try:
+            # Queued behind interactive and batch requests for upstream capacity
+            with priority(PRIORITY_BACKGROUND):
+                await insights_service.refresh_insights(db, search_term, num_results)
+        except AdmissionRejected as e:
+            # Upstreams are saturated; leave the capacity to user requests
+            print(f"Pre-warm stopped: {e}")
+            break
+        except Exception as e:
+            print(f"Pre-warm failed for '{search_term}': {e}")
+        refreshed += 1
+
+    return refreshed
+
+async def _run_scheduler(db: AsyncIOMotorDatabase) -> None:
+    while True:
+        await asyncio.sleep(PREWARM_INTERVAL_SECONDS)
+        try:
+            refreshed = await prewarm_once(db)
+            if refreshed:
+                print(f"Pre-warmed {refreshed} popular search terms")
+        except Exception as e:
+            print(f"Pre-warm run failed: {e}")
+
+def start_prewarm_scheduler(db: AsyncIOMotorDatabase) -> None:
+    """Start the background pre-warm loop (no-op if disabled or already running)."""
+    global _scheduler_task
+    if not PREWARM_ENABLED or _scheduler_task is not None:
+        return
+    _scheduler_task = asyncio.create_task(_run_scheduler(db))
+
+async def stop_prewarm_scheduler() -> None:
+    """Stop the background pre-warm loop."""
+    global _scheduler_task
+    if _scheduler_task is None:
+        return
+    _scheduler_task.cancel()
+    try:
+        await _scheduler_task
+    except asyncio.CancelledError:
+        pass
+    _scheduler_task = None
@@ -1,41 +1,200 @@
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
-from typing import List, Dict, Any
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 from ..mongodb.models import SearchTermModel
+from . import write_behind_service
+import base64
 
-def create_search_term(db: Database, term: str, user_id: str) -> Dict[str, Any]:
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Only the fields the SearchTerm schema returns
+SEARCH_TERM_PROJECTION = {"term": 1, "user_id": 1, "created_at": 1}
+
+async def create_search_term(db: AsyncIOMotorDatabase, term: str, user_id: str) -> Dict[str, Any]:
     """Create a new search term for a user."""
     search_term_data = SearchTermModel.to_document(
         term=term,
         user_id=user_id
     )
-    result = db[SearchTermModel.collection_name].insert_one(search_term_data)
+    result = await db[SearchTermModel.collection_name].insert_one(search_term_data)
     # Convert ObjectId to string before returning
     search_term_data["_id"] = str(result.inserted_id)
     return search_term_data
 
-def get_user_search_terms(db: Database, user_id: str) -> List[Dict[str, Any]]:
-    """Get all search terms for a specific user."""
-    cursor = db[SearchTermModel.collection_name].find(
-        {"user_id": user_id}
-    ).sort("created_at", -1)  # -1 for descending order (newest first)
+async def record_search_term(db: AsyncIOMotorDatabase, term: str, user_id: str) -> None:
+    """
+    Save a search term for a user in the background, if they don't have it yet.
+
+    Used for terms saved as a side effect of a search: the write goes through
+    the write-behind queue, so the search response doesn't wait for it.
+    """
+    await write_behind_service.enqueue(db, SearchTermModel.collection_name, [UpdateOne(
+        {"user_id": user_id, "term": term},
+        {"$setOnInsert": SearchTermModel.to_document(term=term, user_id=user_id)},
+        upsert=True
+    )])
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past a search term in newest-first order."""
+    created_at = doc["created_at"].isoformat()
+    raw = f"{created_at}|{doc['_id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Parse a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, _id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), ObjectId(_id)
+    except (ValueError, InvalidId, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+async def get_user_search_terms(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Get one page of a user's search terms (or all of them), newest first.
+
+    Pages are keyed on (created_at, _id), so each page is a bounded range
+    scan of the (user_id, created_at, _id) index however many terms the
+    user has saved.
+
+    Args:
+        db (AsyncIOMotorDatabase): Database handle
+        user_id (str): Owner of the search terms
+        limit (Optional[int]): Page size, capped at MAX_PAGE_SIZE; None returns
+            every term from the cursor on
+        cursor (Optional[str]): Cursor returned with the previous page
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Optional[str]]: The page, and the cursor
+        for the next page (None on the last page)
+    """
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query: Dict[str, Any] = {"user_id": user_id}
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]
+
+    find = db[SearchTermModel.collection_name].find(
+        query, SEARCH_TERM_PROJECTION
+    ).sort([("created_at", -1), ("_id", -1)])
+    if limit is None:
+        docs = await find.to_list(length=None)
+        limit = len(docs)
+    else:
+        # Fetch one extra document to learn whether another page follows
+        docs = await find.limit(limit + 1).to_list(length=limit + 1)
 
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    results = docs[:limit]
     # Convert ObjectIds to strings in the results
-    results = []
-    for doc in cursor:
+    for doc in results:
         doc["_id"] = str(doc["_id"])
-        results.append(doc)
-    return results
+    return results, next_cursor
 
-def delete_search_term(db: Database, search_term_id: str, user_id: str) -> bool:
+async def delete_search_term(db: AsyncIOMotorDatabase, search_term_id: str, user_id: str) -> bool:
     """Delete a search term."""
-    result = db[SearchTermModel.collection_name].delete_one({
+    result = await db[SearchTermModel.collection_name].delete_one({
         "_id": ObjectId(search_term_id),
         "user_id": user_id
     })
 
     return result.deleted_count > 0
 
-def get_search_term_by_id(db: Database, search_term_id: str) -> Dict[str, Any]:
+async def create_search_terms(db: AsyncIOMotorDatabase, terms: List[str], user_id: str) -> List[Dict[str, Any]]:
+    """
+    Create many search terms for a user in one unordered insert_many.
+
+    Terms the user already has are rejected by the (user_id, term) unique
+    index without stopping the rest of the batch.
+
+    Returns:
+        List[Dict[str, Any]]: One outcome per input term, in input order, with
+        status "created" (and the new id), "duplicate" or "error"
+    """
+    outcomes: List[Dict[str, Any]] = []
+    documents = []
+    # Index into outcomes for each document sent to the database
+    positions = []
+    seen = set()
+    for term in terms:
+        if term in seen:
+            outcomes.append({"term": term, "status": "duplicate"})
+            continue
+        seen.add(term)
+        positions.append(len(outcomes))
+        outcomes.append({"term": term, "status": "created"})
+        documents.append(SearchTermModel.to_document(term=term, user_id=user_id))
+
+    if not documents:
+        return outcomes
+
+    try:
+        await db[SearchTermModel.collection_name].insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            outcome = outcomes[positions[error["index"]]]
+            outcome["status"] = "duplicate" if error.get("code") == 11000 else "error"
+
+    for position, document in zip(positions, documents):
+        if outcomes[position]["status"] == "created":
+            outcomes[position]["id"] = str(document["_id"])
+    return outcomes
+
+async def delete_search_terms(db: AsyncIOMotorDatabase, search_term_ids: List[str], user_id: str) -> List[Dict[str, Any]]:
+    """
+    Delete many of a user's search terms with one lookup and one delete_many.
+
+    Returns:
+        List[Dict[str, Any]]: One outcome per input id, in input order, with
+        status "deleted", "not_found" (missing or owned by someone else) or
+        "invalid" (not an ObjectId)
+    """
+    object_ids = {
+        search_term_id: ObjectId(search_term_id)
+        for search_term_id in search_term_ids
+        if ObjectId.is_valid(search_term_id)
+    }
+
+    owned = set()
+    if object_ids:
+        collection = db[SearchTermModel.collection_name]
+        query = {"_id": {"$in": list(set(object_ids.values()))}, "user_id": user_id}
+        owned = {doc["_id"] async for doc in collection.find(query, {"_id": 1})}
+        if owned:
+            await collection.delete_many({"_id": {"$in": list(owned)}, "user_id": user_id})
+
+    outcomes = []
+    for search_term_id in search_term_ids:
+        object_id = object_ids.get(search_term_id)
+        if object_id is None:
+            status = "invalid"
+        elif object_id in owned:
+            # Repeated ids are only reported as deleted once
+            status = "deleted"
+            owned.discard(object_id)
+        else:
+            status = "not_found"
+        outcomes.append({"id": search_term_id, "status": status})
+    return outcomes
+
+async def get_search_term_by_id(db: AsyncIOMotorDatabase, search_term_id: str) -> Dict[str, Any]:
     """Get a search term by ID."""
-    return db[SearchTermModel.collection_name].find_one({"_id": ObjectId(search_term_id)})
\ No newline at end of file
+    return await db[SearchTermModel.collection_name].find_one({"_id": ObjectId(search_term_id)})
\ No newline at end of file
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+from typing import List, Dict, Any, Optional, Tuple
+from ..utils import metrics
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+# Deferred writes held in memory at most; beyond this callers wait, then drop
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+# Most operations sent in one flush
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+# How long a caller waits for room in a full queue before its write is dropped
+WRITE_BEHIND_PUT_TIMEOUT_SECONDS = float(os.getenv("WRITE_BEHIND_PUT_TIMEOUT_SECONDS", "1"))
+# How long shutdown may spend flushing what is still queued
+WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+DUPLICATE_KEY_ERROR = 11000
+
+# (database, collection name, pymongo write operation)
+QueuedWrite = Tuple[AsyncIOMotorDatabase, str, Any]
+
+_queue: Optional[asyncio.Queue] = None
+_writer_task: Optional[asyncio.Task] = None
+_inflight_write: Optional[asyncio.Task] = None
+
+async def enqueue(db: AsyncIOMotorDatabase, collection_name: str, operations: List[Any]) -> None:
+    """
+    Queue write operations (UpdateOne, InsertOne, ...) to be flushed later.
+
+    Returns as soon as the operations are queued, so the caller doesn't wait
+    on Mongo. When the queue is full the caller waits for room (backpressure)
+    up to WRITE_BEHIND_PUT_TIMEOUT_SECONDS, after which the write is dropped.
+    Without a running writer the operations are written immediately.
+    """
+    if not operations:
+        return
+    if _queue is None:
+        await _write([(db, collection_name, operation) for operation in operations])
+        return
+
+    for operation in operations:
+        item = (db, collection_name, operation)
+        try:
+            _queue.put_nowait(item)
+        except asyncio.QueueFull:
+            metrics.WRITE_BEHIND_BACKPRESSURE.inc()
+            try:
+                await asyncio.wait_for(_queue.put(item), WRITE_BEHIND_PUT_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                print(f"Write-behind queue full, dropping write to {collection_name}")
+                metrics.WRITE_BEHIND_OPERATIONS.inc(outcome="dropped")
+                continue
+        metrics.WRITE_BEHIND_OPERATIONS.inc(outcome="queued")
+
+def _drain(limit: int) -> List[QueuedWrite]:
+    """Take up to limit queued writes without waiting."""
+    batch = []
+    while len(batch) < limit:
+        try:
+            batch.append(_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    return batch
+
+async def _write(batch: List[QueuedWrite]) -> None:
+    """Send a batch as one unordered bulk_write per collection."""
+    by_collection: Dict[Tuple[str, str], Tuple[AsyncIOMotorDatabase, List[Any]]] = {}
+    for db, collection_name, operation in batch:
+        by_collection.setdefault((db.name, collection_name), (db, []))[1].append(operation)
+
+    for (_, collection_name), (db, operations) in by_collection.items():
+        failed = 0
+        try:
+            await db[collection_name].bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate keys (e.g. a search term saved twice) are already stored
+            failed = sum(
+                1 for error in e.details.get("writeErrors", [])
+                if error.get("code") != DUPLICATE_KEY_ERROR
+            )
+            if failed:
+                print(f"Write-behind flush to {collection_name}: {failed} of {len(operations)} writes failed")
+        except Exception as e:
+            failed = len(operations)
+            print(f"Write-behind flush to {collection_name} failed: {e}")
+        metrics.WRITE_BEHIND_OPERATIONS.inc(len(operations) - failed, outcome="written")
+        if failed:
+            metrics.WRITE_BEHIND_OPERATIONS.inc(failed, outcome="failed")
+
+async def _run_writer() -> None:
+    global _inflight_write
+    while True:
+        batch = [await _queue.get()]
+        # Whatever queued up during the previous flush goes out together
+        batch.extend(_drain(WRITE_BEHIND_BATCH_SIZE - 1))
+        _inflight_write = asyncio.create_task(_write(batch))
+        # Shielded so stopping the writer doesn't abandon a batch mid-write
+        await asyncio.shield(_inflight_write)
+
+def start_writer() -> None:
+    """Start flushing queued writes in the background (no-op if disabled or running)."""
+    global _queue, _writer_task
+    if not WRITE_BEHIND_ENABLED or _writer_task is not None:
+        return
+    _queue = asyncio.Queue(maxsize=WRITE_BEHIND_MAX_QUEUE)
+    _writer_task = asyncio.create_task(_run_writer())
+
+async def stop_writer() -> None:
+    """Stop the background writer and flush everything still queued."""
+    global _queue, _writer_task, _inflight_write
+    if _writer_task is None:
+        return
+    _writer_task.cancel()
+    try:
+        await _writer_task
+    except asyncio.CancelledError:
+        pass
+    _writer_task = None
+
+    queue = _queue
+
+    async def flush_remaining():
+        if _inflight_write is not None:
+            await _inflight_write
+        while not queue.empty():
+            await _write(_drain(WRITE_BEHIND_BATCH_SIZE))
+
+    try:
+        await asyncio.wait_for(flush_remaining(), WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        print(f"Write-behind shutdown timed out with {queue.qsize()} writes unflushed")
+        metrics.WRITE_BEHIND_OPERATIONS.inc(queue.qsize(), outcome="dropped")
+    # Later writes (if any) go straight to the database
+    _queue = None
+    _inflight_write = None
+
+def get_queue_depth() -> int:
+    return _queue.qsize() if _queue is not None else 0
+
+def _collect_metrics() -> None:
+    metrics.WRITE_BEHIND_QUEUE.set(get_queue_depth())
+
+metrics.REGISTRY.add_collector(_collect_metrics)
@@ -1,4 +1,4 @@
 from .fetch_google_results import fetch_google_search_results
-from .summarize import get_news_insights, summarize_with_openai
+from .summarize import summarize_with_openai
 
-__all__ = ["fetch_google_search_results", "get_news_insights", "summarize_with_openai"] 
\ No newline at end of file
+__all__ = ["fetch_google_search_results", "summarize_with_openai"] 
\ No newline at end of file
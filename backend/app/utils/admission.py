@@ -0,0 +1,210 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+# Lower values are admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_BACKGROUND = 2
+
+# Priority of upstream calls made by the current task. Tasks inherit it from
+# the code that created them, so work started on behalf of a batch request or
+# the pre-warm loop keeps its lower priority.
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the block (and tasks it creates) at the given priority."""
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """An upstream call was refused because the provider's queue is saturated."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is at capacity, retry after {math.ceil(retry_after)}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Rate limiter refilled continuously at rate_per_minute.
+
+    The balance may go negative when a reservation is corrected upwards
+    (e.g. an OpenAI call used more tokens than estimated); later callers then
+    wait until it is paid back.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until amount can be consumed (0 if it can be now)."""
+        self._refill()
+        # A request larger than the bucket waits for a full bucket
+        needed = min(amount, self.capacity) - self._tokens
+        return max(0.0, needed / self.rate) if self.rate else 0.0
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self._tokens -= amount
+
+
+class AdmissionController:
+    """
+    Per-provider admission control for upstream calls.
+
+    Limits concurrent calls and, optionally, requests and tokens per minute.
+    Callers that can't start right away wait in a queue ordered by
+    request_priority; when the queue is full, or a caller has waited
+    max_wait_seconds, AdmissionRejected is raised instead.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_wait_seconds: float,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.active = 0
+        self.rejected = 0
+        # (priority, arrival order, requests, tokens, future)
+        self._waiters: List[Tuple[int, int, int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter[4].done())
+
+    def _rate_delay(self, requests: int, tokens: int) -> float:
+        delay = 0.0
+        if self.request_bucket is not None and requests:
+            delay = max(delay, self.request_bucket.time_until(requests))
+        if self.token_bucket is not None and tokens:
+            delay = max(delay, self.token_bucket.time_until(tokens))
+        return delay
+
+    def _admit(self, requests: int, tokens: int) -> None:
+        self.active += 1
+        if self.request_bucket is not None:
+            self.request_bucket.consume(requests)
+        if self.token_bucket is not None:
+            self.token_bucket.consume(tokens)
+
+    def _dispatch(self) -> None:
+        """Admit waiters in priority order while there is capacity."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters and self.active < self.max_concurrent:
+            _, _, requests, tokens, future = self._waiters[0]
+            if future.done():
+                # Timed out or cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._rate_delay(requests, tokens)
+            if delay > 0:
+                # Rate limited: the head of the queue goes first once the
+                # buckets have refilled
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self._admit(requests, tokens)
+            future.set_result(None)
+
+    def _retry_after(self, requests: int, tokens: int) -> float:
+        return max(1.0, self._rate_delay(requests, tokens))
+
+    def _reject(self, requests: int, tokens: int) -> AdmissionRejected:
+        self.rejected += 1
+        return AdmissionRejected(self.name, self._retry_after(requests, tokens))
+
+    async def acquire(self, requests: int = 1, tokens: int = 0) -> None:
+        """
+        Wait for a slot (and for `requests`/`tokens` of rate budget).
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait times out
+        """
+        if (
+            not self.queued
+            and self.active < self.max_concurrent
+            and self._rate_delay(requests, tokens) == 0
+        ):
+            self._admit(requests, tokens)
+            return
+
+        if self.queued >= self.max_queue:
+            raise self._reject(requests, tokens)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (request_priority.get(), next(self._order), requests, tokens, future))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the wait expired; keep the slot
+                return
+            future.cancel()
+            raise self._reject(requests, tokens)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    def charge_requests(self, requests: int) -> None:
+        """Count extra requests (e.g. retries) made within an admitted call."""
+        if self.request_bucket is not None and requests:
+            self.request_bucket.consume(requests)
+
+    def adjust_tokens(self, delta: int) -> None:
+        """Correct a token reservation once the real usage is known."""
+        if self.token_bucket is not None and delta:
+            self.token_bucket.consume(delta)
+
+    @asynccontextmanager
+    async def slot(self, requests: int = 1, tokens: int = 0) -> AsyncIterator[None]:
+        """Hold an admission slot for the duration of the block."""
+        await self.acquire(requests, tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {"active": self.active, "queued": self.queued, "rejected": self.rejected}
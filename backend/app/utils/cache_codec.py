@@ -0,0 +1,47 @@
+import json
+import zlib
+from typing import Any, Dict, List, Tuple
+
+# Version of the compact cache document format written by encode_insights.
+# Documents without a "format" field are the original layout, with the
+# insights stored as a plain array of subdocuments.
+FORMAT_VERSION = 2
+
+_SOURCE_FIELDS = ("source_title", "source_link")
+
+
+def encode_insights(insights: List[Dict[str, Any]]) -> bytes:
+    """
+    Pack insights into a zlib-compressed payload.
+
+    Title and link are stored once per source article in a table that each
+    insight refers to by index, instead of being repeated for every insight
+    drawn from the same article.
+    """
+    sources: List[Tuple[str, str]] = []
+    source_index: Dict[Tuple[str, str], int] = {}
+    rows = []
+    for insight in insights:
+        source = (insight.get("source_title", ""), insight.get("source_link", ""))
+        if source not in source_index:
+            source_index[source] = len(sources)
+            sources.append(source)
+        rest = {k: v for k, v in insight.items() if k not in _SOURCE_FIELDS}
+        # The common case, an insight with just its text, is stored as a string
+        body = rest["insight"] if rest.keys() == {"insight"} else rest
+        rows.append([source_index[source], body])
+
+    packed = json.dumps({"sources": sources, "insights": rows}, separators=(",", ":"), default=str)
+    return zlib.compress(packed.encode("utf-8"), 6)
+
+
+def decode_insights(payload: bytes) -> List[Dict[str, Any]]:
+    """Unpack a payload written by encode_insights."""
+    packed = json.loads(zlib.decompress(payload))
+    sources = packed["sources"]
+    insights = []
+    for index, body in packed["insights"]:
+        insight = {"insight": body} if isinstance(body, str) else dict(body)
+        insight["source_title"], insight["source_link"] = sources[index]
+        insights.append(insight)
+    return insights
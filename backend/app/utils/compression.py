@@ -0,0 +1,113 @@
+import gzip
+from typing import List, Tuple
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is used when brotli isn't installed
+    brotli = None
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+def _header(headers: Headers, name: bytes) -> bytes:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return b""
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Pick br or gzip from an Accept-Encoding header ("" if neither is accepted)."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """
+    Compress complete response bodies of at least minimum_size bytes.
+
+    Uses brotli when it is installed and the client accepts it, else gzip.
+    Streaming responses (NDJSON, SSE, anything sent in several chunks) pass
+    through untouched so each message still reaches the client immediately.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict((k.lower(), v) for k, v in scope.get("headers", []))
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = _header(headers, b"content-type")
+                if (
+                    _header(headers, b"content-encoding")
+                    or content_type.startswith((b"text/event-stream", b"application/x-ndjson"))
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until we know whether the body is compressed
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = [
+                (k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"
+            ]
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streamed or small: send as is
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers += [
+                (b"content-encoding", encoding.encode("ascii")),
+                (b"content-length", str(len(compressed)).encode("ascii")),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            start_message["headers"] = headers
+            passthrough = True
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
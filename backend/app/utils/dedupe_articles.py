@@ -0,0 +1,61 @@
+import os
+import re
+import zlib
+from typing import List, Dict, Any, Set
+
+# Articles whose title+snippet shingles overlap at least this much (Jaccard)
+# are treated as copies of the same story
+SIMILARITY_THRESHOLD = float(os.getenv("DEDUPE_SIMILARITY_THRESHOLD", "0.5"))
+SHINGLE_SIZE = 3
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def _shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """Hashed word n-grams of a piece of text."""
+    words = _WORD.findall(text.casefold())
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+def _jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def collapse_near_duplicates(
+    articles: List[Dict[str, Any]], threshold: float = SIMILARITY_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Collapse syndicated copies of the same story into one article.
+
+    Articles are compared on the shingles of their title and snippet. Each
+    group of near-duplicates is represented by its highest-ranked member,
+    which gains a `links` list holding every link in the group (its own
+    first). The prompt lists the extra links as other places the story ran.
+
+    Args:
+        articles (List[Dict[str, Any]]): Search results in rank order
+        threshold (float): Jaccard similarity at which two articles are merged
+
+    Returns:
+        List[Dict[str, Any]]: One article per story, in rank order
+    """
+    representatives: List[Dict[str, Any]] = []
+    representative_shingles: List[Set[int]] = []
+
+    for article in articles:
+        shingles = _shingles(f"{article.get('title', '')} {article.get('snippet', '')}")
+        for i, existing in enumerate(representative_shingles):
+            if _jaccard(shingles, existing) >= threshold:
+                representatives[i]["links"].append(article.get("link", ""))
+                break
+        else:
+            representatives.append({**article, "links": [article.get("link", "")]})
+            representative_shingles.append(shingles)
+
+    if len(representatives) < len(articles):
+        print(f"Collapsed {len(articles)} articles into {len(representatives)} distinct stories")
+    return representatives
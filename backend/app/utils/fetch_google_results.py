@@ -1,54 +1,187 @@
+import asyncio
 import os
 from dotenv import load_dotenv
-import requests
-from typing import List, Dict, Any
+import httpx
+from typing import List, Dict, Any, Optional
+from . import metrics
+from .admission import AdmissionController
+from .resilience import CircuitBreaker, HedgePolicy, UpstreamError, call_with_retries, hedged_call
 
 # Load environment variables
 load_dotenv()
 
-def fetch_google_search_results(search_term: str, num_results: int = 10) -> List[Dict[str, Any]]:
+RESULTS_PER_PAGE = 10
+MAX_RESULTS = 100
+# Overridable so benchmarks can point at a local stand-in
+GOOGLE_CSE_URL = os.getenv("GOOGLE_CSE_URL", "https://www.googleapis.com/customsearch/v1")
+
+# Admission control for Custom Search: concurrent searches, page requests per
+# minute, and how many callers may wait (and for how long) before getting a 429
+google_admission = AdmissionController(
+    "google",
+    max_concurrent=int(os.getenv("GOOGLE_MAX_CONCURRENCY", "8")),
+    requests_per_minute=float(os.getenv("GOOGLE_REQUESTS_PER_MINUTE", "100")),
+    max_queue=int(os.getenv("UPSTREAM_MAX_QUEUE", "100")),
+    max_wait_seconds=float(os.getenv("UPSTREAM_MAX_WAIT_SECONDS", "10")),
+)
+
+# Timeout for one page request, and the deadline for a page including its
+# retries and hedged duplicates
+GOOGLE_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_TIMEOUT_SECONDS", "4"))
+GOOGLE_DEADLINE_SECONDS = float(os.getenv("GOOGLE_DEADLINE_SECONDS", "10"))
+GOOGLE_MAX_RETRIES = int(os.getenv("GOOGLE_MAX_RETRIES", "2"))
+
+google_breaker = CircuitBreaker(
+    "google",
+    failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+    reset_seconds=float(os.getenv("CIRCUIT_RESET_SECONDS", "30")),
+)
+# Page requests slower than the recent p95 get a duplicate request
+google_hedge = HedgePolicy("google")
+
+# Shared client so Custom Search calls reuse pooled keep-alive connections
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=httpx.Timeout(GOOGLE_TIMEOUT_SECONDS, connect=2.0)
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (called on app shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def _fetch_page(base_url: str, params: Dict[str, Any], start: int, num: int) -> List[Dict[str, Any]]:
+    """Fetch one page of Custom Search results starting at a 1-based offset."""
+    response = await get_http_client().get(
+        base_url, params={**params, 'start': start, 'num': num}
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    if 'items' not in data:
+        return []
+
+    return [{
+        'title': item.get('title', ''),
+        'link': item.get('link', ''),
+        'snippet': item.get('snippet', ''),
+        'date': item.get('pagemap', {}).get('metatags', [{}])[0].get('article:published_time', '')
+    } for item in data['items']]
+
+def _describe(error: BaseException) -> str:
+    """Log line for a failed page request (HTTPStatusError text includes the URL, and so the API key)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"Custom Search returned HTTP {error.response.status_code}"
+    return f"{type(error).__name__}: {error}"
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+async def _fetch_page_resilient(base_url: str, params: Dict[str, Any], start: int, num: int) -> List[Dict[str, Any]]:
+    """_fetch_page with jittered retries, hedging and an overall deadline."""
+    attempts = 0
+
+    async def send():
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            # Retries and hedges use quota too
+            google_admission.charge_requests(1)
+        return await _fetch_page(base_url, params, start, num)
+
+    try:
+        return await asyncio.wait_for(
+            call_with_retries(
+                lambda: hedged_call(send, google_hedge),
+                "google", GOOGLE_MAX_RETRIES + 1, _is_retryable
+            ),
+            GOOGLE_DEADLINE_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise httpx.TimeoutException(f"Custom Search page {start} missed its {GOOGLE_DEADLINE_SECONDS}s deadline")
+
+async def fetch_google_search_results(search_term: str, num_results: int = 10) -> List[Dict[str, Any]]:
     """
     Fetch search results from Google using the Custom Search API.
-    
+
+    The API returns at most 10 results per request, so larger requests are
+    split into pages that are fetched concurrently and merged in rank order.
+
     Args:
         search_term (str): The search query
-        num_results (int): Number of results to return (max 10 per request)
-    
+        num_results (int): Number of results to return (max 100)
+
     Returns:
         List[Dict[str, Any]]: List of search results with title, link, and snippet
+
+    Raises:
+        UpstreamError: If every page request failed
     """
     api_key = os.getenv('GOOGLE_API_KEY')
     cse_id = os.getenv('GOOGLE_CSE_ID')
-    
+
     if not api_key or not cse_id:
         raise ValueError("API key or Custom Search Engine ID not found in environment variables")
 
     full_search_term = f"Recent news about {search_term}"
-    
-    base_url = "https://www.googleapis.com/customsearch/v1"
+
+    base_url = GOOGLE_CSE_URL
     params = {
         'key': api_key,
         'cx': cse_id,
         'q': full_search_term,
-        'num': min(num_results, 10),  # Google API limits to 10 results per request
         'sort': 'date'  # Sort by date to get recent results
     }
-    
-    try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        if 'items' not in data:
-            return []
-            
-        return [{
-            'title': item.get('title', ''),
-            'link': item.get('link', ''),
-            'snippet': item.get('snippet', ''),
-            'date': item.get('pagemap', {}).get('metatags', [{}])[0].get('article:published_time', '')
-        } for item in data['items']]
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching search results: {e}")
-        return [] 
\ No newline at end of file
+
+    # Google API limits to 10 results per request and 100 results overall
+    total = max(0, min(num_results, MAX_RESULTS))
+    pages = [
+        (start, min(RESULTS_PER_PAGE, total - start + 1))
+        for start in range(1, total + 1, RESULTS_PER_PAGE)
+    ]
+
+    google_breaker.raise_if_open()
+    # Each page is a separate Custom Search request against the quota
+    async with google_admission.slot(requests=len(pages)):
+        with google_breaker.guard(), \
+                metrics.STAGE_LATENCY.time(stage="fetch_google_search_results"), \
+                metrics.IN_FLIGHT.track_in_progress(operation="google_search"):
+            responses = await asyncio.gather(
+                *(_fetch_page_resilient(base_url, params, start, num) for start, num in pages),
+                return_exceptions=True
+            )
+            errors = [page for page in responses if isinstance(page, BaseException)]
+            if errors and len(errors) == len(responses):
+                # Nothing came back: count it against the provider
+                metrics.UPSTREAM_ERRORS.inc(len(errors), provider="google")
+                print(f"Error fetching search results: {_describe(errors[0])}")
+                raise UpstreamError("google") from errors[0]
+
+    results = []
+    seen_links = set()
+    for page in responses:
+        if isinstance(page, httpx.HTTPError):
+            print(f"Error fetching search results: {_describe(page)}")
+            metrics.UPSTREAM_ERRORS.inc(provider="google")
+            continue
+        if isinstance(page, BaseException):
+            raise page
+        for item in page:
+            # Later pages can repeat results as the index shifts between calls
+            if item['link'] in seen_links:
+                continue
+            seen_links.add(item['link'])
+            results.append(item)
+
+    return results[:total]
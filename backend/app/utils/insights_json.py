@@ -0,0 +1,40 @@
+import json
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used when orjson isn't installed
+    orjson = None
+
+# Fields of the API's Insight model, in response order
+INSIGHT_FIELDS = ("insight", "source_title", "source_link")
+
+
+def dumps(value: Any) -> bytes:
+    """Encode value as compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def serialize_insights(insights: List[Dict[str, Any]]) -> bytes:
+    """
+    Validate insights and encode them as an /api/insights response body.
+
+    Produces what response_model=List[Insight] would: only the Insight fields
+    are kept, and each must be a string. Doing this once per cache entry lets
+    hits send the bytes as they are.
+
+    Raises:
+        ValueError: If an insight is missing a field or has a non-string value
+    """
+    validated = []
+    for insight in insights:
+        item = {}
+        for field in INSIGHT_FIELDS:
+            value = insight.get(field)
+            if not isinstance(value, str):
+                raise ValueError(f"Insight field '{field}' must be a string, got {value!r}")
+            item[field] = value
+        validated.append(item)
+    return dumps(validated)
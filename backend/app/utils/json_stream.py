@@ -0,0 +1,80 @@
+import json
+from typing import Any, List
+
+
+class JSONArrayStreamParser:
+    """
+    Incrementally parse a JSON array that arrives in arbitrary chunks.
+
+    feed() returns each top-level object/array element as soon as its closing
+    bracket arrives, so callers can act on it before the rest of the array has
+    been received. Text before the opening '[' (e.g. a ```json fence) and
+    top-level scalar elements are ignored.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._buffer: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing ']' of the array has been seen."""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume the next chunk of text.
+
+        Args:
+            chunk (str): Next piece of the streamed response
+
+        Returns:
+            List[Any]: Elements completed by this chunk, in order
+        """
+        completed = []
+        for ch in chunk:
+            if self._finished:
+                break
+
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                # Between elements: only the start of an element or the end
+                # of the array matter
+                if ch in "{[":
+                    self._depth = 1
+                    self._buffer = [ch]
+                elif ch == "]":
+                    self._finished = True
+                continue
+
+            self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    text = "".join(self._buffer)
+                    self._buffer = []
+                    try:
+                        completed.append(json.loads(text))
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed streamed element: {e}")
+        return completed
@@ -0,0 +1,257 @@
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    @contextmanager
+    def track_in_progress(self, **labels: str) -> Iterator[None]:
+        """Increment for the duration of the block."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = [[0] * len(self.buckets), 0.0, 0]
+            self._values[key] = state
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe how long the block takes (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run collector before each render, e.g. to copy stats into gauges."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "newsai_stage_duration_seconds",
+    "Time spent in each stage of the insights pipeline.",
+    ["stage"]
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "newsai_cache_lookups_total",
+    "Insights cache lookups by result (hit, stale, semantic, miss).",
+    ["result"]
+))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "newsai_upstream_errors_total",
+    "Failed calls to upstream providers.",
+    ["provider"]
+))
+OPENAI_TOKENS = REGISTRY.register(Counter(
+    "newsai_openai_tokens_total",
+    "OpenAI tokens used (estimated for streamed completions).",
+    ["kind"]
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "newsai_in_flight",
+    "Operations currently in progress.",
+    ["operation"]
+))
+LOCAL_CACHE = REGISTRY.register(Gauge(
+    "newsai_local_cache",
+    "In-process insights cache counters and occupancy.",
+    ["stat"]
+))
+WRITE_BEHIND_OPERATIONS = REGISTRY.register(Counter(
+    "newsai_write_behind_operations_total",
+    "Deferred database writes by outcome (queued, written, dropped, failed).",
+    ["outcome"]
+))
+WRITE_BEHIND_BACKPRESSURE = REGISTRY.register(Counter(
+    "newsai_write_behind_backpressure_total",
+    "Times a request had to wait for room in the full write-behind queue."
+))
+WRITE_BEHIND_QUEUE = REGISTRY.register(Gauge(
+    "newsai_write_behind_queue_depth",
+    "Deferred database writes waiting to be flushed."
+))
+UPSTREAM_ADMISSION = REGISTRY.register(Gauge(
+    "newsai_upstream_admission",
+    "Upstream admission control: active calls, queued callers and rejections.",
+    ["provider", "stat"]
+))
+UPSTREAM_RETRIES = REGISTRY.register(Counter(
+    "newsai_upstream_retries_total",
+    "Upstream calls retried after a transient failure.",
+    ["provider"]
+))
+UPSTREAM_HEDGES = REGISTRY.register(Counter(
+    "newsai_upstream_hedges_total",
+    "Hedged duplicate requests sent, and how many of them answered first.",
+    ["provider", "outcome"]
+))
+CIRCUIT_STATE = REGISTRY.register(Gauge(
+    "newsai_circuit_state",
+    "Upstream circuit breaker state (0 closed, 1 half-open, 2 open).",
+    ["provider"]
+))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "newsai_startup_seconds",
+    "Time spent importing the app, in startup hooks, and bootstrapping the database.",
+    ["phase"]
+))
@@ -0,0 +1,241 @@
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Deque, Iterator, Optional, TypeVar
+
+from . import metrics
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """A provider's circuit breaker is open, so the call was not attempted."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is unavailable, retry after {math.ceil(retry_after)}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class UpstreamError(Exception):
+    """
+    A provider call failed.
+
+    The message is safe to show to clients; the underlying error (whose text
+    can include request URLs and API keys) is logged and chained as __cause__.
+    """
+
+    def __init__(self, provider: str):
+        super().__init__(f"{provider} request failed")
+        self.provider = provider
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a provider keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused for reset_seconds. Then a single trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._set_state(CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.CIRCUIT_STATE.set(_STATE_VALUES[state], provider=self.name)
+
+    def check(self) -> None:
+        """
+        Raise CircuitOpen unless a call may go ahead now.
+
+        A caller that passes must report the outcome with record_success or
+        record_failure.
+        """
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN:
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpen(self.name, remaining)
+            self._set_state(HALF_OPEN)
+        if self._trial_in_flight:
+            raise CircuitOpen(self.name, 1.0)
+        self._trial_in_flight = True
+
+    def raise_if_open(self) -> None:
+        """Fail fast while open, without claiming the half-open trial call."""
+        if self.state == OPEN:
+            remaining = self._opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpen(self.name, remaining)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        check() on entry, then record the outcome of the block.
+
+        Errors count as failures; cancellation (e.g. the client went away)
+        records nothing.
+        """
+        self.check()
+        try:
+            yield
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self._trial_in_flight = False
+            raise
+        self.record_success()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        if self.state != CLOSED:
+            print(f"Circuit for {self.name} closed")
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                print(f"Circuit for {self.name} opened after {self.failures} failures")
+            self._opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+
+class LatencyTracker:
+    """Recent call latencies, for percentile estimates."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class HedgePolicy:
+    """
+    When to send a duplicate of a slow idempotent request.
+
+    A hedge is sent once a call has taken longer than the recent
+    `percentile` latency, so only the slowest few percent of calls are
+    duplicated. max_ratio caps hedges as a share of all calls, bounding the
+    extra spend even if latency shifts suddenly.
+    """
+
+    def __init__(self, provider: str, percentile: float = 95, min_samples: int = 20,
+                 min_delay: float = 0.05, max_ratio: float = 0.1):
+        self.provider = provider
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.hedges = 0
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if this call shouldn't be hedged."""
+        if len(self.latency) < self.min_samples or self.hedges >= self.max_ratio * self.calls:
+            return None
+        return max(self.min_delay, self.latency.percentile(self.percentile))
+
+
+async def hedged_call(fn: Callable[[], Awaitable[T]], policy: HedgePolicy) -> T:
+    """
+    Run fn, and run it again in parallel if the first attempt is slow.
+
+    The first attempt to succeed wins and the other is cancelled. If both
+    fail, the last error is raised.
+    """
+    policy.calls += 1
+
+    async def timed() -> T:
+        start = time.perf_counter()
+        result = await fn()
+        policy.latency.record(time.perf_counter() - start)
+        return result
+
+    primary = asyncio.ensure_future(timed())
+    delay = policy.delay()
+    if delay is None:
+        return await primary
+
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            policy.hedges += 1
+            metrics.UPSTREAM_HEDGES.inc(provider=policy.provider, outcome="sent")
+            backup = asyncio.ensure_future(timed())
+            pending.add(backup)
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        metrics.UPSTREAM_HEDGES.inc(provider=policy.provider, outcome="won")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def backoff_delay(attempt: int, base: float = 0.2, cap: float = 2.0) -> float:
+    """Full-jitter exponential backoff for the given retry (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def call_with_retries(
+    fn: Callable[[], Awaitable[T]],
+    provider: str,
+    attempts: int,
+    is_retryable: Callable[[BaseException], bool],
+) -> T:
+    """
+    Call fn up to `attempts` times, sleeping with jittered backoff between tries.
+
+    Only errors for which is_retryable is true are retried; only use this for
+    idempotent calls.
+    """
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt + 1 >= attempts or not is_retryable(e):
+                raise
+            metrics.UPSTREAM_RETRIES.inc(provider=provider)
+            await asyncio.sleep(backoff_delay(attempt))
+    raise AssertionError("unreachable")
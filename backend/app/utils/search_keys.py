@@ -0,0 +1,49 @@
+import re
+import unicodedata
+
+# Words that don't change what a news search is about. "news"/"latest"/
+# "recent" are redundant because every query is already "Recent news about ..."
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "into", "is", "it", "its", "of", "on", "or", "over", "the", "to", "with",
+    "about", "latest", "recent", "news", "update", "updates",
+})
+# Stopwords that are redundant in every query, however they are typed
+_QUERY_WORDS = frozenset({"about", "latest", "recent", "news", "update", "updates"})
+
+# A word starts with a letter or digit and may contain "+", "#" and "&", so
+# "C++", "C#" and "AT&T" stay distinct; other punctuation separates words
+_WORD = re.compile(r"[^\W_](?:[^\W_]|[+#&])*", re.UNICODE)
+
+def _is_stopword(word: str, all_caps: bool) -> bool:
+    folded = word.casefold()
+    if folded in _QUERY_WORDS:
+        return True
+    # Other stopwords typed in capitals are usually acronyms ("IT jobs", "OR
+    # nurses"), unless the whole term is in capitals ("AI IN THE EU")
+    return folded in STOPWORDS and (all_caps or not (len(word) > 1 and word.isupper()))
+
+def normalize_search_term(search_term: str) -> str:
+    """
+    Build the canonical cache key for a search term.
+
+    Folds case, unicode compatibility forms and accents, collapses
+    punctuation/whitespace, drops stopwords and sorts the remaining words,
+    so "NVIDIA news", " nvidia" and "Nvidia" share one key. "+", "#" and "&"
+    inside words are kept, and stopwords typed in capitals are not dropped
+    unless the whole term is in capitals.
+
+    Args:
+        search_term (str): The search term as typed by the user
+
+    Returns:
+        str: Canonical key for cache lookups
+    """
+    text = unicodedata.normalize("NFKD", search_term)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+
+    words = _WORD.findall(text)
+    all_caps = text.isupper()
+    content_words = [w for w in words if not _is_stopword(w, all_caps)]
+    # A term made only of stopwords ("The The") keeps its words
+    return " ".join(sorted({w.casefold() for w in content_words or words}))
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from passlib.context import CryptContext
@@ -6,8 +8,10 @@ import os
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from ..mongodb.config import get_db
+from .ttl_cache import TTLCache
+from . import metrics
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +21,15 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-for-development")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Recently loaded users, keyed by email (the token's `sub`), so authenticated
+# requests don't each need a database round-trip. Token expiry is still
+# checked on every request when the JWT is decoded.
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+_user_cache = TTLCache(
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=USER_CACHE_TTL_SECONDS,
+)
+
 # Password context configuration
 pwd_context = CryptContext(
     schemes=["bcrypt"],
@@ -24,6 +37,13 @@ pwd_context = CryptContext(
     bcrypt__rounds=12
 )
 
+# bcrypt takes ~250ms of CPU per call at 12 rounds, so it runs on a bounded
+# thread pool (bcrypt releases the GIL) instead of on the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+
 # OAuth2 scheme for token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -35,6 +55,16 @@ def get_password_hash(password: str) -> str:
     """Generate password hash."""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate a password hash without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -47,7 +77,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Database = Depends(get_db)) -> Dict[str, Any]:
+async def _load_user(db: AsyncIOMotorDatabase, email: str) -> Optional[Dict[str, Any]]:
+    """Get a user by email, from the short-lived user cache when possible."""
+    user = _user_cache.get(email)
+    if user is None:
+        from ..services.user_service import get_user_by_email  # Import here to avoid circular import
+        with metrics.STAGE_LATENCY.time(stage="user_lookup"):
+            user = await get_user_by_email(db, email)
+        if user is None:
+            return None
+        _user_cache.set(email, user)
+    # Copy so a handler mutating its user can't change the cached one
+    return dict(user)
+
+def invalidate_cached_user(email: str) -> None:
+    """Forget a cached user; call whenever a user record changes."""
+    _user_cache.delete(email)
+
+def clear_user_cache() -> None:
+    """Forget every cached user."""
+    _user_cache.clear()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncIOMotorDatabase = Depends(get_db)) -> Dict[str, Any]:
     """
     Get the current user from the JWT token.
     This function will be used as a dependency in protected endpoints.
@@ -67,9 +118,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Database = D
     except JWTError:
         raise credentials_exception
 
-    from ..services.user_service import get_user_by_email  # Import here to avoid circular import
-    # Get user from database
-    user = get_user_by_email(db, email)
+    # Get user from cache or database
+    user = await _load_user(db, email)
     if user is None:
         raise credentials_exception
 
@@ -77,7 +127,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Database = D
 
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
-async def get_current_user_optional(token: str = Depends(oauth2_scheme_optional), db: Database = Depends(get_db)) -> Optional[Dict[str, Any]]:
+async def get_current_user_optional(token: str = Depends(oauth2_scheme_optional), db: AsyncIOMotorDatabase = Depends(get_db)) -> Optional[Dict[str, Any]]:
     """
     Get the current user from the JWT token, but don't require authentication.
     Returns None if no token or invalid token.
@@ -92,10 +142,8 @@ async def get_current_user_optional(token: str = Depends(oauth2_scheme_optional)
         if email is None:
             return None
 
-        from ..services.user_service import get_user_by_email  # Import here to avoid circular import
-        # Get user from database
-        user = get_user_by_email(db, email)
-        return user
+        # Get user from cache or database
+        return await _load_user(db, email)
     except Exception:
         # Return None for any error (JWT, database, etc.)
         return None
\ No newline at end of file
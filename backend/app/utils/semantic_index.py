@@ -0,0 +1,313 @@
+import math
+import time
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Hashed feature space; large enough that unrelated n-grams rarely collide
+NUM_FEATURES = 1 << 20
+CHAR_NGRAM = 3
+# Character n-grams only smooth over spelling variants; words decide the match
+CHAR_NGRAM_WEIGHT = 0.2
+# Starting capacity of a feature's posting arrays; they double when full
+INITIAL_POSTING_SIZE = 4
+# Matches above the threshold that are re-scored with IDF weights
+RESCORE_CANDIDATES = 20
+# Largest share of a key's IDF-weighted vector that words missing from the
+# other key may carry ("nvidia earnings" vs "nvidia earnings report")
+MAX_UNSHARED_WORD_WEIGHT = 0.1
+# Character trigram overlap (Jaccard) at which two words are spelling variants
+SPELLING_VARIANT_SIMILARITY = 0.5
+
+
+def _stem(word: str) -> str:
+    """Fold plurals onto their singular ("prices" -> "price", "companies" -> "company")."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def _word_feature(stem: str) -> int:
+    return zlib.crc32(b"w:" + stem.encode("utf-8")) % NUM_FEATURES
+
+
+def _trigrams(stem: str) -> Set[str]:
+    padded = f" {stem} "
+    return {padded[i:i + CHAR_NGRAM] for i in range(len(padded) - CHAR_NGRAM + 1)}
+
+
+def _unmatched_words(stems: Set[str], others: Set[str]) -> Set[str]:
+    """Stems with neither an equal stem nor a spelling variant among others."""
+    unmatched = set()
+    for stem in stems - others:
+        grams = _trigrams(stem)
+        if not any(
+            len(grams & _trigrams(other)) / len(grams | _trigrams(other)) >= SPELLING_VARIANT_SIMILARITY
+            for other in others - stems
+        ):
+            unmatched.add(stem)
+    return unmatched
+
+
+def vectorize(text: str) -> Dict[int, float]:
+    """
+    Turn a canonical search key into a sparse, L2-normalized feature vector.
+
+    Features are hashed word stems plus lightly weighted character trigrams,
+    so plurals ("regulation"/"regulations") match while a different word
+    ("EU"/"US") still pulls the similarity down.
+
+    Args:
+        text (str): Canonical search key (see normalize_search_term)
+
+    Returns:
+        Dict[int, float]: Feature id -> weight
+    """
+    counts: Dict[int, float] = {}
+    for word in text.split():
+        stem = _stem(word)
+        feature = _word_feature(stem)
+        counts[feature] = counts.get(feature, 0.0) + 1.0
+
+        padded = f" {stem} "
+        for i in range(len(padded) - CHAR_NGRAM + 1):
+            gram = padded[i:i + CHAR_NGRAM].encode("utf-8")
+            feature = zlib.crc32(b"c:" + gram) % NUM_FEATURES
+            counts[feature] = counts.get(feature, 0.0) + CHAR_NGRAM_WEIGHT
+
+    norm = math.sqrt(sum(w * w for w in counts.values()))
+    if not norm:
+        return {}
+    return {feature: weight / norm for feature, weight in counts.items()}
+
+
+class SemanticIndex:
+    """
+    In-memory cosine-similarity index over search keys.
+
+    Stored as an inverted index (feature -> rows, weights) so a query only
+    touches rows sharing a feature with it, instead of every stored vector.
+    Each posting list is a pair of preallocated arrays appended to in place,
+    so writes never rebuild anything. Removal just marks a row inactive;
+    rows are compacted when most are dead.
+
+    Candidates are found by term-frequency cosine, then re-scored with
+    features weighted by inverse document frequency over the indexed keys,
+    so a rare distinguishing word outweighs common shared ones. A word
+    swapped for a different one ("model 3"/"model y", "march"/"june") always
+    rejects a match; extra words only when they carry real weight.
+    """
+
+    def __init__(
+        self,
+        max_terms: int = 100000,
+        frequent_feature_rows: int = 1000,
+        max_unshared_weight: float = MAX_UNSHARED_WORD_WEIGHT
+    ):
+        self.max_terms = max_terms
+        self.max_unshared_weight = max_unshared_weight
+        # Posting lists longer than this are only scanned when they could
+        # decide whether a match reaches the query threshold
+        self.frequent_feature_rows = frequent_feature_rows
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._added_at: List[float] = []
+        self._active = np.zeros(1024, dtype=bool)
+        # Zeroed scratch space, one slot per row, for looking up frequent features
+        self._row_weights = np.zeros(1024, dtype=np.float32)
+        # feature -> [row ids, weights, length, live rows], filled up to length
+        self._postings: Dict[int, list] = {}
+        self._num_active = 0
+
+    def __len__(self) -> int:
+        return self._num_active
+
+    def __contains__(self, key: str) -> bool:
+        row = self._rows.get(key)
+        return row is not None and bool(self._active[row])
+
+    def add(self, key: str) -> None:
+        """Index a search key (refreshing its timestamp if already present)."""
+        row = self._rows.get(key)
+        if row is not None and self._active[row]:
+            self._added_at[row] = time.monotonic()
+            return
+
+        if self._num_active >= self.max_terms:
+            self._evict_oldest()
+
+        row = len(self._keys)
+        self._keys.append(key)
+        self._added_at.append(time.monotonic())
+        self._rows[key] = row
+        if row >= len(self._active):
+            self._active = np.concatenate([self._active, np.zeros(len(self._active), dtype=bool)])
+            self._row_weights = np.zeros(len(self._active), dtype=np.float32)
+        self._active[row] = True
+        self._num_active += 1
+
+        for feature, weight in vectorize(key).items():
+            posting = self._postings.get(feature)
+            if posting is None:
+                posting = [
+                    np.empty(INITIAL_POSTING_SIZE, dtype=np.int32),
+                    np.empty(INITIAL_POSTING_SIZE, dtype=np.float32),
+                    0,
+                    0,
+                ]
+                self._postings[feature] = posting
+            rows, weights, length, _ = posting
+            if length == len(rows):
+                posting[0] = rows = np.concatenate([rows, np.empty(length, dtype=np.int32)])
+                posting[1] = weights = np.concatenate([weights, np.empty(length, dtype=np.float32)])
+            rows[length] = row
+            weights[length] = weight
+            posting[2] = length + 1
+            posting[3] += 1
+
+    def remove(self, key: str) -> None:
+        """Drop a search key from the index."""
+        row = self._rows.pop(key, None)
+        if row is None or not self._active[row]:
+            return
+        self._active[row] = False
+        self._num_active -= 1
+        for feature in vectorize(key):
+            self._postings[feature][3] -= 1
+        if len(self._keys) > 1024 and self._num_active < len(self._keys) // 2:
+            self._compact()
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Remove keys added longer ago than max_age_seconds. Returns how many."""
+        cutoff = time.monotonic() - max_age_seconds
+        stale = [
+            key for key, row in self._rows.items()
+            if self._active[row] and self._added_at[row] < cutoff
+        ]
+        for key in stale:
+            self.remove(key)
+        return len(stale)
+
+    def query(self, text: str, k: int = 3, threshold: float = 0.0, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Find the stored keys most similar to text.
+
+        Rows are found through the query's rarer features. Frequent features
+        are left out of that scan as long as they can't lift a row to the
+        threshold on their own (their combined query weight stays below it),
+        and only add their weight to the rows already found, so results are
+        the same as scanning everything. The best of those are then re-scored
+        with IDF weights and must reach the threshold again. Words that are
+        in only one of the two keys (spelling variants aside) reject the
+        match if both keys have some, or if they carry more than
+        max_unshared_weight of their key's weight.
+
+        Args:
+            text (str): Canonical search key to match
+            k (int): Maximum number of matches to return
+            threshold (float): Minimum cosine similarity
+            exclude (Optional[str]): Key to leave out of the results
+
+        Returns:
+            List[Tuple[str, float]]: (key, similarity), most similar first
+        """
+        if not self._num_active:
+            return []
+
+        matched = [
+            (self._postings[feature], query_weight)
+            for feature, query_weight in vectorize(text).items()
+            if feature in self._postings
+        ]
+        # Most frequent first, so they are the ones left out of the scan
+        matched.sort(key=lambda item: -item[0][2])
+        skipped = []
+        skipped_weight = 0.0
+        for posting, query_weight in matched:
+            if posting[2] <= self.frequent_feature_rows:
+                break
+            if skipped_weight + query_weight * query_weight >= threshold * threshold:
+                break
+            skipped.append((posting, query_weight))
+            skipped_weight += query_weight * query_weight
+        scanned = matched[len(skipped):]
+        if not scanned:
+            return []
+
+        # Score only the rows that share a scanned feature with the query
+        candidates, inverse = np.unique(
+            np.concatenate([posting[0][:posting[2]] for posting, _ in scanned]), return_inverse=True
+        )
+        scores = np.bincount(
+            inverse,
+            weights=np.concatenate([posting[1][:posting[2]] * query_weight for posting, query_weight in scanned])
+        )
+        for (rows, weights, length, _), query_weight in skipped:
+            self._row_weights[rows[:length]] = weights[:length]
+            scores += self._row_weights[candidates] * query_weight
+            self._row_weights[rows[:length]] = 0.0
+
+        scores[~self._active[candidates]] = 0.0
+        if exclude is not None and exclude in self._rows:
+            scores[candidates == self._rows[exclude]] = 0.0
+
+        eligible = np.flatnonzero((scores > 0) & (scores >= threshold))
+        if len(eligible) > RESCORE_CANDIDATES:
+            eligible = eligible[np.argpartition(-scores[eligible], RESCORE_CANDIDATES - 1)[:RESCORE_CANDIDATES]]
+
+        query_vector = self._idf_weighted(vectorize(text))
+        query_stems = {_stem(word) for word in text.split()}
+        matches = []
+        for i in eligible:
+            key = self._keys[candidates[i]]
+            key_vector = self._idf_weighted(vectorize(key))
+            similarity = sum(weight * key_vector.get(feature, 0.0) for feature, weight in query_vector.items())
+            if similarity <= 0 or similarity < threshold:
+                continue
+            key_stems = {_stem(word) for word in key.split()}
+            query_only = _unmatched_words(query_stems, key_stems)
+            key_only = _unmatched_words(key_stems, query_stems)
+            if query_only and key_only:
+                continue
+            unshared = max(
+                sum(query_vector.get(_word_feature(stem), 0.0) ** 2 for stem in query_only),
+                sum(key_vector.get(_word_feature(stem), 0.0) ** 2 for stem in key_only)
+            )
+            if unshared > self.max_unshared_weight:
+                continue
+            matches.append((key, similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches[:k]
+
+    def _idf_weighted(self, vector: Dict[int, float]) -> Dict[int, float]:
+        """Reweight a vector by smoothed inverse document frequency and L2-normalize it."""
+        weighted = {}
+        for feature, weight in vector.items():
+            posting = self._postings.get(feature)
+            live = posting[3] if posting is not None else 0
+            weighted[feature] = weight * (math.log((1 + self._num_active) / (1 + live)) + 1)
+        norm = math.sqrt(sum(w * w for w in weighted.values()))
+        if not norm:
+            return {}
+        return {feature: weight / norm for feature, weight in weighted.items()}
+
+    def _evict_oldest(self) -> None:
+        """Make room by removing the oldest tenth of the index."""
+        live = sorted(
+            (self._added_at[row], key) for key, row in self._rows.items() if self._active[row]
+        )
+        for _, key in live[:max(1, len(live) // 10)]:
+            self.remove(key)
+
+    def _compact(self) -> None:
+        """Rebuild the index from its live keys, dropping dead rows."""
+        live = sorted(
+            (self._added_at[row], key) for key, row in self._rows.items() if self._active[row]
+        )
+        self.__init__(self.max_terms, self.frequent_feature_rows, self.max_unshared_weight)
+        for added_at, key in live:
+            self.add(key)
+            self._added_at[self._rows[key]] = added_at
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+
+    The first caller for a key starts the work; every caller that arrives while
+    it is still in flight awaits the same result (or exception) instead of
+    starting its own copy.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Return True if work for this key is currently running."""
+        return key in self._in_flight
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        Start fn() for key unless it is already running, without waiting for it.
+
+        Returns:
+            asyncio.Task: The task running the shared call
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            # Run the work in its own task so a caller disconnecting
+            # doesn't cancel it for everyone else waiting on the key
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() for key, or join the call that is already running.
+
+        Args:
+            key (Hashable): Coalescing key
+            fn (Callable[[], Awaitable[Any]]): Zero-argument coroutine factory
+
+        Returns:
+            Any: The result of the single shared call
+        """
+        return await asyncio.shield(self.start(key, fn))
+
+
+class Broadcast:
+    """
+    Items produced by one task, delivered to any number of readers.
+
+    Each reader gets every item from the start, including those published
+    before it subscribed, then waits for more until the producer closes the
+    broadcast.
+    """
+
+    def __init__(self):
+        self._items: List[Any] = []
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Wake current readers; later waits use a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, item: Any) -> None:
+        self._items.append(item)
+        self._notify()
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """End the broadcast; readers re-raise error once they have every item."""
+        self._closed = True
+        self._error = error
+        self._notify()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self._items):
+                yield self._items[index]
+                index += 1
+            if self._closed:
+                if self._error is not None:
+                    raise self._error
+                return
+            await changed.wait()
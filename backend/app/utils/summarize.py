@@ -1,44 +1,53 @@
 import os
 from dotenv import load_dotenv
-import openai
-from typing import List, Dict, Any
-from .fetch_google_results import fetch_google_search_results
+from openai import AsyncOpenAI
+from typing import List, Dict, Any, Optional, AsyncIterator
+from .fetch_google_results import google_admission
+from .json_stream import JSONArrayStreamParser
+from . import metrics
+from .admission import AdmissionController
+from .resilience import CircuitBreaker, CircuitOpen, UpstreamError
 import json
 
 # Load environment variables
 load_dotenv()
 
-def summarize_with_openai(articles: List[Dict[str, Any]], search_term: str) -> List[Dict[str, Any]]:
-    """
-    Use OpenAI to extract individual insights from articles.
-    
-    Args:
-        articles (List[Dict[str, Any]]): List of articles with title, link, snippet, and date
-        search_term (str): The search term used to find the articles
-    
-    Returns:
-        List[Dict[str, Any]]: List of insights with their sources
-    """
-    openai.api_key = os.getenv('OPENAI_API_KEY')
-    
-    if not openai.api_key:
-        raise ValueError("OpenAI API key not found in environment variables")
-    
-    # Prepare the content for analysis
-    content = f"Here are recent news articles about '{search_term}':\n\n"
-    for i, article in enumerate(articles):
-        content += f"Article {i+1}:\n"
-        content += f"Title: {article['title']}\n"
-        content += f"Summary: {article['snippet']}\n"
-        if article.get('date'):
-            content += f"Date: {article['date']}\n"
-        content += f"Link: {article['link']}\n\n"
-    
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": """You are a precise data extraction assistant. Your task is to extract individual insights from news articles and format them as a JSON array.
+_openai_client: Optional[AsyncOpenAI] = None
+
+# Per-attempt timeout and retry count for OpenAI calls. Completions aren't
+# hedged: a duplicate would double the token spend.
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+openai_breaker = CircuitBreaker(
+    "openai",
+    failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+    reset_seconds=float(os.getenv("CIRCUIT_RESET_SECONDS", "30")),
+)
+
+def get_openai_client() -> AsyncOpenAI:
+    """Return the shared async OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OpenAI API key not found in environment variables")
+        # The SDK retries connection errors, 429s and 5xxs with jittered backoff
+        _openai_client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=OPENAI_TIMEOUT_SECONDS,
+            max_retries=OPENAI_MAX_RETRIES
+        )
+    return _openai_client
+
+async def close_openai_client() -> None:
+    """Close the shared OpenAI client (called on app shutdown)."""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+
+SYSTEM_PROMPT = """You are a precise data extraction assistant. Your task is to extract individual insights from news articles and format them as a JSON array.
 
 IMPORTANT: Your response must be a valid JSON array containing objects. Each object must have exactly these fields:
 - insight: A clear, concise statement of one specific fact or development
@@ -64,65 +73,272 @@ Guidelines:
 2. Include source information for each insight
 3. Ensure each insight is unique
 4. Focus on recent developments
-5. Keep insights concise and clear"""},
-                {"role": "user", "content": f"Please extract individual insights from these news articles about {search_term} and format them as a JSON array:\n\n{content}"}
-            ],
-            max_tokens=1000,
-            temperature=0.3  # Lower temperature for more consistent, factual output
-        )
-        
+5. Keep insights concise and clear"""
+
+REQUIRED_FIELDS = ('insight', 'source_title', 'source_link')
+
+# Approximate token limit for the prompt sent to OpenAI
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# Search snippets longer than this are trimmed before being sent
+MAX_SNIPPET_CHARS = int(os.getenv("PROMPT_MAX_SNIPPET_CHARS", "400"))
+# Completion limit per call, also reserved against the tokens-per-minute budget
+MAX_COMPLETION_TOKENS = 1000
+
+# Admission control for OpenAI: concurrent calls, requests and tokens per
+# minute, and how many callers may wait (and for how long) before getting a 429
+openai_admission = AdmissionController(
+    "openai",
+    max_concurrent=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+    requests_per_minute=float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500")),
+    tokens_per_minute=float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "60000")),
+    max_queue=int(os.getenv("UPSTREAM_MAX_QUEUE", "100")),
+    max_wait_seconds=float(os.getenv("UPSTREAM_MAX_WAIT_SECONDS", "10")),
+)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+def _article_block(index: int, article: Dict[str, Any], max_snippet_chars: int) -> str:
+    snippet = " ".join(article['snippet'].split())
+    if len(snippet) > max_snippet_chars:
+        snippet = snippet[:max_snippet_chars].rsplit(" ", 1)[0] + "..."
+
+    block = f"Article {index}:\n"
+    block += f"Title: {article['title']}\n"
+    block += f"Summary: {snippet}\n"
+    if article.get('date'):
+        block += f"Date: {article['date']}\n"
+    block += f"Link: {article['link']}\n"
+    # Syndicated copies merged into this article (see dedupe_articles)
+    also = [link for link in article.get('links', [])[1:] if link and link != article['link']]
+    if also:
+        block += f"Also published at: {', '.join(also)}\n"
+    return block + "\n"
+
+def _prompt_parts(search_term: str):
+    instruction = f"Please extract individual insights from these news articles about {search_term} and format them as a JSON array:\n\n"
+    header = f"Here are recent news articles about '{search_term}':\n\n"
+    return instruction, header
+
+def select_articles_for_prompt(
+    articles: List[Dict[str, Any]],
+    search_term: str,
+    token_budget: int = PROMPT_TOKEN_BUDGET
+) -> List[Dict[str, Any]]:
+    """
+    Return the leading articles (in rank order) that fit in the prompt budget.
+
+    Args:
+        articles (List[Dict[str, Any]]): Articles in rank order
+        search_term (str): The search term used to find the articles
+        token_budget (int): Approximate token limit for the whole prompt
+
+    Returns:
+        List[Dict[str, Any]]: The articles to pass to build_messages
+    """
+    instruction, header = _prompt_parts(search_term)
+    remaining = token_budget - estimate_tokens(SYSTEM_PROMPT + instruction + header)
+
+    selected = []
+    for article in articles:
+        cost = estimate_tokens(_article_block(len(selected) + 1, article, MAX_SNIPPET_CHARS))
+        if cost > remaining:
+            break
+        selected.append(article)
+        remaining -= cost
+
+    if len(selected) < len(articles):
+        print(f"Prompt budget fits {len(selected)} of {len(articles)} articles")
+    return selected
+
+def build_messages(articles: List[Dict[str, Any]], search_term: str) -> List[Dict[str, str]]:
+    """
+    Build the chat messages asking OpenAI to extract insights from articles.
+
+    Long snippets are trimmed. Every article given is included, so callers
+    pass the ones chosen by select_articles_for_prompt.
+
+    Args:
+        articles (List[Dict[str, Any]]): List of articles with title, link, snippet, and date
+        search_term (str): The search term used to find the articles
+
+    Returns:
+        List[Dict[str, str]]: System and user messages for the chat completion
+    """
+    instruction, content = _prompt_parts(search_term)
+    for i, article in enumerate(articles):
+        content += _article_block(i + 1, article, MAX_SNIPPET_CHARS)
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": instruction + content}
+    ]
+
+def _reserved_tokens(messages: List[Dict[str, str]]) -> int:
+    """Tokens to reserve for a call: the prompt plus the largest possible completion."""
+    return sum(estimate_tokens(m["content"]) for m in messages) + MAX_COMPLETION_TOKENS
+
+def is_valid_insight(insight: Any) -> bool:
+    """
+    Check that an insight is an object whose required fields are all strings.
+
+    Anything else would be stored per article and then fail to serialize on
+    every later request that uses it.
+    """
+    return isinstance(insight, dict) and all(isinstance(insight.get(key), str) for key in REQUIRED_FIELDS)
+
+async def summarize_with_openai(articles: List[Dict[str, Any]], search_term: str) -> List[Dict[str, Any]]:
+    """
+    Use OpenAI to extract individual insights from articles.
+
+    Args:
+        articles (List[Dict[str, Any]]): Articles chosen by select_articles_for_prompt
+        search_term (str): The search term used to find the articles
+
+    Returns:
+        List[Dict[str, Any]]: List of insights with their sources (empty if
+        the model's answer can't be parsed)
+
+    Raises:
+        UpstreamError: If the OpenAI request fails (timeout, 5xx, rate limit)
+    """
+    client = get_openai_client()
+    messages = build_messages(articles, search_term)
+    reserved = _reserved_tokens(messages)
+
+    # Outside the try below, so a rejection reaches the caller as a 429/503
+    openai_breaker.raise_if_open()
+    await openai_admission.acquire(tokens=reserved)
+    try:
+        with openai_breaker.guard(), \
+                metrics.STAGE_LATENCY.time(stage="summarize_with_openai"), \
+                metrics.IN_FLIGHT.track_in_progress(operation="openai"):
+            response = await client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                max_tokens=MAX_COMPLETION_TOKENS,
+                temperature=0.3  # Lower temperature for more consistent, factual output
+            )
+
+        if response.usage:
+            metrics.OPENAI_TOKENS.inc(response.usage.prompt_tokens, kind="prompt")
+            metrics.OPENAI_TOKENS.inc(response.usage.completion_tokens, kind="completion")
+            openai_admission.adjust_tokens(response.usage.total_tokens - reserved)
+
         # Get the response content
-        response_content = response.choices[0].message.content.strip()
-        
+        response_content = (response.choices[0].message.content or "").strip()
+
         # Try to parse the JSON response
         try:
             insights = json.loads(response_content)
         except json.JSONDecodeError as e:
+            metrics.UPSTREAM_ERRORS.inc(provider="openai")
             print(f"Error parsing JSON response: {e}")
             print("Raw response:", response_content)
             return []
-            
+
         # Validate the structure
         if not isinstance(insights, list):
             print("Error: Response is not a JSON array")
             return []
-            
+
         # Validate each insight has required fields
         valid_insights = []
         for insight in insights:
-            if all(key in insight for key in ['insight', 'source_title', 'source_link']):
+            if is_valid_insight(insight):
                 valid_insights.append(insight)
             else:
                 print(f"Warning: Skipping invalid insight structure: {insight}")
-                
+
         return valid_insights
-        
+
+    except CircuitOpen:
+        raise
     except Exception as e:
+        metrics.UPSTREAM_ERRORS.inc(provider="openai")
         print(f"Error generating insights: {e}")
-        return []
+        raise UpstreamError("openai") from e
+    finally:
+        openai_admission.release()
 
-def get_news_insights(search_term: str, num_results: int = 5) -> List[Dict[str, Any]]:
+async def stream_insights_with_openai(articles: List[Dict[str, Any]], search_term: str) -> AsyncIterator[Dict[str, Any]]:
     """
-    Main function to fetch news and generate structured insights.
-    
+    Like summarize_with_openai, but yield each insight as soon as it is complete.
+
+    The completion is streamed and parsed incrementally, so the first insight
+    is available long before the whole response has been generated.
+
     Args:
-        search_term (str): The search term to find news about
-        num_results (int): Number of articles to fetch and analyze
-    
-    Returns:
-        List[Dict[str, Any]]: List of insights with their sources
+        articles (List[Dict[str, Any]]): Articles chosen by select_articles_for_prompt
+        search_term (str): The search term used to find the articles
+
+    Yields:
+        Dict[str, Any]: Insights with their sources, in generation order
+
+    Raises:
+        UpstreamError: After the last insight, if the stream failed or ended
+        before the JSON array was complete
     """
-    # Fetch search results
-    results = fetch_google_search_results(search_term, num_results)
-    
-    if not results:
-        print(f"No recent news found for '{search_term}'")
-        return []
-    
-    # Generate insights using OpenAI
-    insights = summarize_with_openai(results, search_term)
-    
-    if not insights:
-        print("No valid insights were generated")
-    
-    return insights 
\ No newline at end of file
+    client = get_openai_client()
+    parser = JSONArrayStreamParser()
+    messages = build_messages(articles, search_term)
+    completion_chars = 0
+    reserved = _reserved_tokens(messages)
+
+    openai_breaker.raise_if_open()
+    error: Optional[Exception] = None
+    async with openai_admission.slot(tokens=reserved):
+        with metrics.STAGE_LATENCY.time(stage="summarize_with_openai_stream"), \
+                metrics.IN_FLIGHT.track_in_progress(operation="openai"):
+            try:
+                with openai_breaker.guard():
+                    stream = await client.chat.completions.create(
+                        model="gpt-3.5-turbo",
+                        messages=messages,
+                        max_tokens=MAX_COMPLETION_TOKENS,
+                        temperature=0.3,
+                        stream=True
+                    )
+
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if not delta:
+                            continue
+                        completion_chars += len(delta)
+                        for insight in parser.feed(delta):
+                            if is_valid_insight(insight):
+                                yield insight
+                            else:
+                                print(f"Warning: Skipping invalid insight structure: {insight}")
+
+            except CircuitOpen:
+                raise
+            except Exception as e:
+                metrics.UPSTREAM_ERRORS.inc(provider="openai")
+                print(f"Error streaming insights: {e}")
+                error = e
+
+    # Streamed responses don't report usage, so estimate it
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    completion_tokens = (completion_chars + 3) // 4
+    metrics.OPENAI_TOKENS.inc(prompt_tokens, kind="prompt")
+    metrics.OPENAI_TOKENS.inc(completion_tokens, kind="completion")
+    openai_admission.adjust_tokens(prompt_tokens + completion_tokens - reserved)
+
+    if error is None and not parser.finished:
+        print("Warning: Streamed response ended before the JSON array was closed")
+        metrics.UPSTREAM_ERRORS.inc(provider="openai")
+    if error is not None or not parser.finished:
+        # The insights yielded so far are only part of the answer
+        raise UpstreamError("openai") from error
+
+def _collect_metrics() -> None:
+    """Copy admission control state into the /metrics gauges."""
+    for admission in (google_admission, openai_admission):
+        for stat, value in admission.stats().items():
+            metrics.UPSTREAM_ADMISSION.set(value, provider=admission.name, stat=stat)
+
+metrics.REGISTRY.add_collector(_collect_metrics)
@@ -0,0 +1,183 @@
+"""
+Local stand-ins for the Google Custom Search and OpenAI chat completion APIs.
+
+Responses are deterministic for a given query, so repeated searches return the
+same articles, and each endpoint can be given a latency and an error rate.
+
+    python -m bench.fake_upstreams --port 9100 --google-latency-ms 150 --openai-latency-ms 800
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "market growth policy launch report rates energy chip startup funding "
+    "climate court election trade vote deal merger outage recall research "
+    "study profit loss shares inflation jobs housing supply demand battery "
+    "satellite vaccine drought storm league transfer tariff budget model"
+).split()
+
+_TITLE = re.compile(r"^Title: (.*)$", re.MULTILINE)
+_LINK = re.compile(r"^Link: (.*)$", re.MULTILINE)
+
+settings = {
+    "google_latency": 0.15,
+    "openai_latency": 0.8,
+    "google_error_rate": 0.0,
+    "openai_error_rate": 0.0,
+}
+
+app = FastAPI(title="NewsAI benchmark upstreams")
+
+
+async def _simulate_latency(seconds: float) -> None:
+    # +-50% jitter so requests don't complete in lockstep
+    if seconds > 0:
+        await asyncio.sleep(seconds * random.uniform(0.5, 1.5))
+
+
+def _should_fail(rate: float) -> bool:
+    return rate > 0 and random.random() < rate
+
+
+def _error_response(message: str) -> JSONResponse:
+    return JSONResponse({"error": {"code": 500, "message": message}}, status_code=500)
+
+
+def _article(query: str, position: int) -> Dict[str, Any]:
+    """Deterministic fake search result for a query and 1-based rank."""
+    rng = random.Random(zlib.crc32(f"{query}:{position}".encode("utf-8")))
+    slug = "-".join(rng.sample(WORDS, 3))
+    return {
+        "title": " ".join(rng.sample(WORDS, 6)).capitalize(),
+        "link": f"https://news.example.com/{zlib.crc32(query.encode('utf-8')):08x}/{position}/{slug}",
+        "snippet": " ".join(rng.choice(WORDS) for _ in range(40)),
+        "pagemap": {"metatags": [{"article:published_time": "2024-03-01T12:00:00Z"}]},
+    }
+
+
+@app.get("/customsearch/v1")
+async def custom_search(q: str = "", start: int = 1, num: int = 10):
+    await _simulate_latency(settings["google_latency"])
+    if _should_fail(settings["google_error_rate"]):
+        return _error_response("Injected Custom Search failure")
+    num = max(1, min(num, 10))
+    return {"items": [_article(q, position) for position in range(start, start + num)]}
+
+
+def _insights_for_prompt(prompt: str) -> List[Dict[str, str]]:
+    """Two insights per article listed in the prompt, citing its title and link."""
+    insights = []
+    for title, link in zip(_TITLE.findall(prompt), _LINK.findall(prompt)):
+        for n in (1, 2):
+            insights.append({
+                "insight": f"Development {n} reported in '{title}'",
+                "source_title": title,
+                "source_link": link,
+            })
+    return insights
+
+
+def _stream_completion(content: str, model: str, latency: float):
+    """Chat completion chunks spread over roughly the configured latency."""
+    chunks = [content[i:i + 40] for i in range(0, len(content), 40)] or [""]
+    delay = latency / len(chunks)
+    completion_id = f"chatcmpl-bench{int(time.time() * 1000)}"
+
+    async def events():
+        for piece in chunks:
+            if delay > 0:
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        done = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-3.5-turbo")
+    prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+    content = json.dumps(_insights_for_prompt(prompt), indent=2)
+
+    if body.get("stream"):
+        if _should_fail(settings["openai_error_rate"]):
+            return _error_response("Injected OpenAI failure")
+        return _stream_completion(content, model, settings["openai_latency"])
+
+    await _simulate_latency(settings["openai_latency"])
+    if _should_fail(settings["openai_error_rate"]):
+        return _error_response("Injected OpenAI failure")
+
+    prompt_tokens = (len(prompt) + 3) // 4
+    completion_tokens = (len(content) + 3) // 4
+    return {
+        "id": f"chatcmpl-bench{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--google-latency-ms", type=float, default=150)
+    parser.add_argument("--openai-latency-ms", type=float, default=800)
+    parser.add_argument("--google-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    settings.update(
+        google_latency=args.google_latency_ms / 1000,
+        openai_latency=args.openai_latency_ms / 1000,
+        google_error_rate=args.google_error_rate,
+        openai_error_rate=args.openai_error_rate,
+    )
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
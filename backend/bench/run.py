@@ -0,0 +1,302 @@
+"""
+Load-test the API offline and report latency percentiles per scenario.
+
+Starts the upstream stand-ins (bench.fake_upstreams) and the app against an
+in-memory MongoDB (bench.serve_app), then drives each scenario at a fixed
+concurrency. Run from the backend directory:
+
+    python -m bench.run --concurrency 50 --requests 1000 --hit-ratio 0.8
+
+Scenarios:
+    insights      POST /api/insights; --hit-ratio of requests reuse a pre-warmed
+                  term, the rest are new terms that go through Google + OpenAI
+    login         POST /auth/login for a benchmark user
+    search-terms  GET /search-terms/ for a user with --saved-terms terms
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("insights", "login", "search-terms")
+HOT_TERMS = 20
+
+BENCH_EMAIL = "bench@example.com"
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    total: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """
+    Send `total` requests with at most `concurrency` in flight.
+
+    Returns:
+        Dict[str, Any]: Request count, errors, wall time and sorted latencies
+        (seconds), plus X-Cache header counts where the endpoint sets them
+    """
+    latencies: List[float] = []
+    errors = 0
+    cache_results: Dict[str, int] = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await send(client, index)
+                ok = response.status_code < 400
+                cache = response.headers.get("X-Cache")
+                if cache:
+                    cache_results[cache] = cache_results.get(cache, 0) + 1
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "latencies": latencies,
+        "cache": cache_results,
+    }
+
+
+async def _login(client: httpx.AsyncClient) -> httpx.Response:
+    return await client.post("/auth/login", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+
+
+async def prepare_user(client: httpx.AsyncClient, saved_terms: int) -> str:
+    """Register (or log in) the benchmark user, save its terms, and return a token."""
+    response = await client.post("/auth/register", json={
+        "email": BENCH_EMAIL, "username": BENCH_USERNAME, "password": BENCH_PASSWORD
+    })
+    if response.status_code == 400:
+        response = await _login(client)
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    existing = await client.get("/search-terms/", headers=headers)
+    existing.raise_for_status()
+    for i in range(len(existing.json()), saved_terms):
+        created = await client.post("/search-terms/", json={"term": f"saved topic {i}"}, headers=headers)
+        created.raise_for_status()
+    return token
+
+
+def hot_term(i: int) -> str:
+    return f"benchmark topic {i}"
+
+
+async def prewarm_hot_terms(client: httpx.AsyncClient, num_results: int) -> None:
+    """Fill the cache for the terms the insights scenario treats as hits."""
+    responses = await asyncio.gather(*(
+        client.post("/api/insights", json={"search_term": hot_term(i), "num_results": num_results})
+        for i in range(HOT_TERMS)
+    ))
+    failed = [r.status_code for r in responses if r.status_code >= 400]
+    if failed:
+        print(f"Warning: {len(failed)} of {HOT_TERMS} hot terms failed to pre-warm ({failed[0]})")
+
+
+def make_scenario(name: str, args: argparse.Namespace, token: str):
+    rng = random.Random(args.seed)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    if name == "insights":
+        async def send(client: httpx.AsyncClient, index: int) -> httpx.Response:
+            if rng.random() < args.hit_ratio:
+                term = hot_term(rng.randrange(HOT_TERMS))
+            else:
+                # A random token keeps the term clear of exact and
+                # paraphrase matches in the cache
+                term = f"uncached {uuid.uuid4().hex}"
+            return await client.post(
+                "/api/insights", json={"search_term": term, "num_results": args.num_results}
+            )
+        return send
+
+    if name == "login":
+        async def send(client: httpx.AsyncClient, index: int) -> httpx.Response:
+            return await _login(client)
+        return send
+
+    if name == "search-terms":
+        async def send(client: httpx.AsyncClient, index: int) -> httpx.Response:
+            return await client.get("/search-terms/", headers=headers)
+        return send
+
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def summarize_run(name: str, run: Dict[str, Any]) -> Dict[str, Any]:
+    latencies = run["latencies"]
+    summary = {
+        "scenario": name,
+        "requests": run["requests"],
+        "errors": run["errors"],
+        "rps": run["requests"] / run["seconds"] if run["seconds"] else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+    if run["cache"]:
+        summary["cache"] = run["cache"]
+    return summary
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'scenario':<14}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['scenario']:<14}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}"
+        )
+        if "cache" in r:
+            counts = ", ".join(f"{k}={v}" for k, v in sorted(r["cache"].items()))
+            print(f"{'':<14}X-Cache: {counts}")
+
+
+def _start(module: str, extra_args: List[str], verbose: bool) -> subprocess.Popen:
+    output = None if verbose else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, "-m", module, *extra_args],
+        cwd=BACKEND_DIR, stdout=output, stderr=output
+    )
+
+
+async def wait_until_healthy(url: str, process: Optional[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    processes: List[subprocess.Popen] = []
+    try:
+        app_url = args.app_url
+        if app_url is None:
+            upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+            upstreams = _start("bench.fake_upstreams", [
+                "--port", str(args.upstream_port),
+                "--google-latency-ms", str(args.google_latency_ms),
+                "--openai-latency-ms", str(args.openai_latency_ms),
+                "--google-error-rate", str(args.google_error_rate),
+                "--openai-error-rate", str(args.openai_error_rate),
+            ], args.verbose)
+            processes.append(upstreams)
+            await wait_until_healthy(f"{upstream_url}/health", upstreams)
+
+            app_url = f"http://127.0.0.1:{args.app_port}"
+            server = _start("bench.serve_app", [
+                "--port", str(args.app_port), "--upstream-url", upstream_url
+            ], args.verbose)
+            processes.append(server)
+            await wait_until_healthy(f"{app_url}/api/ready", server)
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=args.timeout) as client:
+            token = await prepare_user(client, args.saved_terms)
+            if "insights" in args.scenarios:
+                await prewarm_hot_terms(client, args.num_results)
+
+            results = []
+            for name in args.scenarios:
+                print(f"Running {name}: {args.requests} requests at concurrency {args.concurrency}")
+                send = make_scenario(name, args, token)
+                results.append(summarize_run(name, await drive(client, send, args.requests, args.concurrency)))
+            return results
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--hit-ratio", type=float, default=0.8, help="share of insights requests for cached terms")
+    parser.add_argument("--num-results", type=int, default=10)
+    parser.add_argument("--saved-terms", type=int, default=20, help="search terms saved for the benchmark user")
+    parser.add_argument("--google-latency-ms", type=float, default=150)
+    parser.add_argument("--openai-latency-ms", type=float, default=800)
+    parser.add_argument("--google-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--upstream-port", type=int, default=9100)
+    parser.add_argument("--app-url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show server output")
+    args = parser.parse_args()
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args))
+    print()
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items() if k != "json_path"}, "results": results}, f, indent=2)
+        print(f"\nWrote {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Run the API against the local upstream stand-ins and an in-memory MongoDB.
+
+    python -m bench.serve_app --port 8100 --upstream-url http://127.0.0.1:9100
+
+Mongo is replaced by mongomock-motor, so numbers measure the app and its
+upstream waits, not database round trips.
+"""
+import argparse
+import os
+
+
+def use_in_memory_mongo() -> None:
+    """Make app.mongodb.config build an in-memory client instead of connecting."""
+    import motor.motor_asyncio
+    import mongomock.collection
+    from mongomock_motor import AsyncMongoMockClient
+
+    class InMemoryClient(AsyncMongoMockClient):
+        def __init__(self, *args, **kwargs):
+            # Ignore the connection string and pool options
+            super().__init__()
+
+    motor.motor_asyncio.AsyncIOMotorClient = InMemoryClient
+
+    # pymongo 4.11 passes a sort argument to bulk operations that mongomock
+    # does not accept yet
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace", "add_delete", "add_insert"):
+        original = getattr(builder, name, None)
+        if original is None:
+            continue
+
+        def without_sort(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+
+        setattr(builder, name, without_sort)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--upstream-url", default="http://127.0.0.1:9100")
+    args = parser.parse_args()
+
+    os.environ["GOOGLE_CSE_URL"] = f"{args.upstream_url}/customsearch/v1"
+    os.environ["OPENAI_BASE_URL"] = f"{args.upstream_url}/v1"
+    # Never send real keys (e.g. from .env) to the stand-ins
+    os.environ["GOOGLE_API_KEY"] = "bench"
+    os.environ["GOOGLE_CSE_ID"] = "bench"
+    os.environ["OPENAI_API_KEY"] = "bench"
+    # Background pre-warming would add upstream traffic the run didn't ask for
+    os.environ.setdefault("PREWARM_ENABLED", "false")
+    # The stand-ins have no quota; set these explicitly to benchmark the limits
+    for name in ("GOOGLE_REQUESTS_PER_MINUTE", "OPENAI_REQUESTS_PER_MINUTE", "OPENAI_TOKENS_PER_MINUTE"):
+        os.environ.setdefault(name, "0")
+
+    use_in_memory_mongo()
+
+    import uvicorn
+    from app.main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from app.main import _upstream_unavailable
+from app.utils.admission import (
+    AdmissionController, AdmissionRejected, TokenBucket, priority,
+    PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BACKGROUND,
+)
+
+
+def make_controller(**overrides) -> AdmissionController:
+    options = {"name": "test", "max_concurrent": 1, "max_queue": 10, "max_wait_seconds": 5}
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def scenario():
+        controller = make_controller()
+        admitted = []
+
+        async def call(name, level):
+            with priority(level):
+                await controller.acquire()
+            admitted.append(name)
+            controller.release()
+
+        await controller.acquire()
+        tasks = []
+        for name, level in [
+            ("background", PRIORITY_BACKGROUND),
+            ("batch", PRIORITY_BATCH),
+            ("interactive-1", PRIORITY_INTERACTIVE),
+            ("interactive-2", PRIORITY_INTERACTIVE),
+        ]:
+            tasks.append(asyncio.create_task(call(name, level)))
+            await asyncio.sleep(0)
+        assert controller.queued == 4
+
+        controller.release()
+        await asyncio.gather(*tasks)
+        return admitted
+
+    assert asyncio.run(scenario()) == ["interactive-1", "interactive-2", "batch", "background"]
+
+
+def test_full_queue_is_rejected_immediately_with_429():
+    async def scenario():
+        controller = make_controller(max_queue=1)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire()
+
+        controller.release()
+        await waiter
+        controller.release()
+        return controller, excinfo.value
+
+    controller, rejection = asyncio.run(scenario())
+    assert controller.rejected == 1
+    assert controller.active == 0
+    error = _upstream_unavailable(rejection)
+    assert error.status_code == 429
+    assert int(error.headers["Retry-After"]) >= 1
+
+
+def test_wait_timeout_is_rejected_with_429_and_leaves_the_queue():
+    async def scenario():
+        controller = make_controller(max_wait_seconds=0.05)
+        await controller.acquire()
+
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire()
+        assert controller.queued == 0
+
+        # The timed-out caller must not be admitted later
+        controller.release()
+        assert controller.active == 0
+        return excinfo.value
+
+    rejection = asyncio.run(scenario())
+    assert _upstream_unavailable(rejection).status_code == 429
+
+
+def test_rate_limited_call_waits_for_the_bucket():
+    async def scenario():
+        # One request per 50ms, so the second call has to wait for a refill
+        controller = make_controller(max_concurrent=5)
+        controller.request_bucket = TokenBucket(1200, capacity=1)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with controller.slot():
+            pass
+        async with controller.slot():
+            pass
+        return loop.time() - start
+
+    assert asyncio.run(scenario()) >= 0.04
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from app.utils.json_stream import JSONArrayStreamParser
+
+INSIGHTS = [
+    {
+        "insight": 'Said "prices [will] fall {soon}" \\ back\\slash',
+        "source_title": "Café — news",
+        "source_link": "https://example.com/a?x=1&y=2",
+    },
+    {"insight": "Nested", "source_title": "T", "source_link": "L", "tags": [[1, 2], {"k": "]"}]},
+]
+RESPONSE = "```json\n" + json.dumps(INSIGHTS, indent=2) + "\n```"
+# Escapes written the way models emit them, to split inside each sequence
+ESCAPED = '[{"insight": "a\\"b\\\\c\\u00e9\\n}", "source_title": "t", "source_link": "l"}]'
+
+
+def feed_chunks(text: str, size: int):
+    parser = JSONArrayStreamParser()
+    elements = []
+    for i in range(0, len(text), size):
+        elements.extend(parser.feed(text[i:i + size]))
+    return parser, elements
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10000])
+def test_elements_survive_any_chunk_size(size):
+    parser, elements = feed_chunks(RESPONSE, size)
+    assert elements == INSIGHTS
+    assert parser.finished
+
+
+def test_every_split_point_inside_escape_sequences():
+    expected = json.loads(ESCAPED)
+    for split in range(1, len(ESCAPED)):
+        parser = JSONArrayStreamParser()
+        elements = parser.feed(ESCAPED[:split]) + parser.feed(ESCAPED[split:])
+        assert elements == expected, f"split at {split}: {ESCAPED[:split]!r}"
+        assert parser.finished
+
+
+def test_each_element_is_returned_as_soon_as_it_closes():
+    text = json.dumps(INSIGHTS)
+    first_end = text.index("}, {") + 1
+    parser = JSONArrayStreamParser()
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [INSIGHTS[0]]
+    assert parser.feed(text[first_end:]) == [INSIGHTS[1]]
+
+
+def test_unclosed_array_is_not_finished():
+    text = json.dumps(INSIGHTS)
+    parser, elements = feed_chunks(text[:-1], 5)
+    assert elements == INSIGHTS
+    assert not parser.finished
+
+
+def test_scalars_and_text_after_the_array_are_ignored():
+    parser, elements = feed_chunks('[1, "two", {"a": 1}, null] [{"b": 2}]', 4)
+    assert elements == [{"a": 1}]
+    assert parser.finished
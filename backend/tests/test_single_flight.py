@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import Broadcast, SingleFlight
+
+
+async def collect(broadcast: Broadcast) -> list:
+    return [item async for item in broadcast.subscribe()]
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "result"
+
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flight.in_flight("key")
+        release.set()
+        results = await asyncio.gather(*callers)
+        return calls, results, flight.in_flight("key")
+
+    calls, results, still_in_flight = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["result"] * 5
+    assert not still_in_flight
+
+
+def test_error_reaches_every_waiting_caller():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            raise ValueError("upstream failed")
+
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+
+        # The failed call is forgotten, so the next caller starts a new one
+        async def retry():
+            return "retried"
+        return results, await flight.do("key", retry)
+
+    results, retried = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == "retried"
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "result"
+
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first.cancelled(), await second
+
+    first_cancelled, result = asyncio.run(scenario())
+    assert first_cancelled
+    assert result == "result"
+
+
+def test_broadcast_late_subscriber_gets_earlier_items():
+    async def scenario():
+        broadcast = Broadcast()
+        broadcast.publish(1)
+        broadcast.publish(2)
+        early = asyncio.create_task(collect(broadcast))
+        await asyncio.sleep(0)
+
+        broadcast.publish(3)
+        late = asyncio.create_task(collect(broadcast))
+        await asyncio.sleep(0)
+        broadcast.publish(4)
+        broadcast.close()
+
+        after_close = await collect(broadcast)
+        return await early, await late, after_close
+
+    early, late, after_close = asyncio.run(scenario())
+    assert early == [1, 2, 3, 4]
+    assert late == [1, 2, 3, 4]
+    assert after_close == [1, 2, 3, 4]
+
+
+def test_broadcast_error_is_raised_after_the_items():
+    async def scenario():
+        broadcast = Broadcast()
+        received = []
+
+        async def read():
+            async for item in broadcast.subscribe():
+                received.append(item)
+
+        reader = asyncio.create_task(read())
+        broadcast.publish("a")
+        await asyncio.sleep(0)
+        broadcast.publish("b")
+        broadcast.close(RuntimeError("stream failed"))
+
+        with pytest.raises(RuntimeError):
+            await reader
+        # A subscriber arriving after the failure sees the same thing
+        late = []
+        with pytest.raises(RuntimeError):
+            async for item in broadcast.subscribe():
+                late.append(item)
+        return received, late
+
+    received, late = asyncio.run(scenario())
+    assert received == ["a", "b"]
+    assert late == ["a", "b"]